@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""Compare launch time of a normal install and a climux zipapp bundle."""
+
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+
+from climux.bundle import bundle
+
+
+RUNS = 20
+EXAMPLE = Path(__file__).resolve().parent.parent / "examples" / "example.py"
+
+
+def measure(command: t.Sequence[str]) -> float:
+    """Return average time (in seconds) to run command."""
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) / RUNS
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        app = bundle(EXAMPLE, Path(tmp) / "hello.pyz")
+        normal = measure([sys.executable, str(EXAMPLE), "hello"])
+        bundled = measure([str(app), "hello"])
+    print(f"script: {normal * 1000:.1f} ms")
+    print(f"bundle: {bundled * 1000:.1f} ms")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""Benchmark registering 10k commands eagerly and with Cli.from_module."""
+
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+import types
+import typing as t
+
+# Import climux from the checkout (python benchmarks/commands.py).
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# pylint: disable=wrong-import-position
+from climux import Cli, Command  # noqa: E402
+
+
+COUNT = 10_000
+
+
+def make_module(count: int) -> types.ModuleType:
+    """Create module with many API wrapper functions."""
+    module = types.ModuleType("api")
+    source = "".join(
+        f"def call_{i}(key: str, *, limit: int = 10, verbose: bool = False):\n"
+        f"    '''Call endpoint {i}.'''\n"
+        f"    return key, limit, verbose\n"
+        for i in range(count)
+    )
+    exec(source, vars(module))  # pylint: disable=exec-used
+    return module
+
+
+def eager(module: types.ModuleType) -> Cli:
+    """Register commands the old way."""
+    cli = Cli("api")
+    for name, obj in vars(module).items():
+        if name.startswith("call_"):
+            cli.add(Command(obj))
+    return cli
+
+
+def lazy(module: types.ModuleType) -> Cli:
+    """Register commands with Cli.from_module."""
+    return Cli.from_module(module)
+
+
+def measure(name: str,
+            register: t.Callable[[types.ModuleType], Cli],
+            module: types.ModuleType) -> None:
+    """Print time and memory used to register and dispatch one command."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    cli = register(module)
+    registered = time.perf_counter()
+    cli.dispatch(["call_42", "--key", "foo"])
+    dispatched = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>6}: register {registered - start:.3f}s, "
+          f"first dispatch {dispatched - registered:.3f}s, "
+          f"peak memory {peak / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    api = make_module(COUNT)
+    print(f"{COUNT} commands")
+    measure("eager", eager, api)
+    measure("lazy", lazy, api)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""Benchmark compiled parsers against infer_parser parsers."""
+
+from pathlib import Path
+import sys
+import time
+import typing as t
+
+from infer_parser import Parser, make_parser
+
+# Import climux from the checkout (python benchmarks/parsers.py).
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# pylint: disable=wrong-import-position
+from climux.compiler import compile_parser  # noqa: E402
+
+
+COUNT = 300_000
+
+CASES: t.List[t.Tuple[t.Any, t.List[str]]] = [
+    (t.List[int], [str(i) for i in range(COUNT)]),
+    (t.Tuple[t.Tuple[int, float], ...],
+     [str(i) for i in range(2 * COUNT)]),
+    (t.Dict[str, t.Tuple[float, float]],
+     [token for i in range(COUNT) for token in (f"k{i}", "1.5", str(i))]),
+    (t.List[t.Tuple[str, int, bool]],
+     [token for i in range(COUNT) for token in ("x", str(i), "true")]),
+]
+
+
+def measure(parser: Parser, tokens: t.List[str], repeat: int = 3) -> float:
+    """Get best time to parse tokens."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(tokens)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    for hint, tokens in CASES:
+        closures = measure(make_parser(hint), tokens)
+        compiled = measure(compile_parser(hint), tokens)
+        print(f"{hint}: {len(tokens)} tokens")
+        print(f"  closures {closures:.3f}s, compiled {compiled:.3f}s "
+              f"({closures / compiled:.1f}x)")
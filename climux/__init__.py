@@ -2,9 +2,12 @@
 
 from infer_parser import Parser
 
-from .args import InvalidFlag, arg, opt, switch, toggle
-from .cli import Cli, run
+from .args import InvalidFlag, arg, opt, resource, switch, toggle
+from .cache import ParseCache, ResultCache
+from .cli import Cli, UsageError, run
 from .command import Command
+from .config import Config, ConfigError
+from .limits import LimitExceeded
 from .utils import make_simple_parser
 
 
@@ -14,13 +17,23 @@ __all__ = [
     "InvalidFlag",
     "arg",
     "opt",
+    "resource",
     "switch",
     "toggle",
 
+    "ParseCache",
+    "ResultCache",
+
     "Cli",
+    "UsageError",
     "run",
 
     "Command",
 
+    "Config",
+    "ConfigError",
+
+    "LimitExceeded",
+
     "make_simple_parser",
 ]
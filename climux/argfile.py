@@ -0,0 +1,40 @@
+"""Argument files (@path) read lazily from memory-mapped files."""
+
+import mmap
+import os
+import typing as t
+
+
+def iter_tokens(path: t.Union[str, "os.PathLike[str]"],
+                encoding: str = "utf-8") -> t.Iterator[str]:
+    """Yield tokens from argument file one at a time.
+
+    Tokens are NUL-delimited if the file contains a NUL byte, and
+    newline-delimited otherwise. A trailing delimiter is ignored.
+    The file is memory-mapped, so it never gets read into memory at once.
+    """
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            sep = b"\0" if data.find(b"\0") != -1 else b"\n"
+            start = 0
+            while start < size:
+                end = data.find(sep, start)
+                if end == -1:
+                    end = size
+                yield data[start:end].decode(encoding)
+                start = end + 1
+
+
+def expand_tokens(tokens: t.Iterable[str], prefix: str) -> t.Iterator[str]:
+    """Replace tokens that start with prefix with the contents of the file."""
+    for token in tokens:
+        if token.startswith(prefix):
+            yield from iter_tokens(token[len(prefix):])
+        else:
+            yield token
+
+
+__all__ = ["expand_tokens", "iter_tokens"]
@@ -7,9 +7,15 @@ import enum
 import inspect
 import typing as t
 
-from infer_parser import Parser, UnsupportedType, make_parser
+from infer_parser import Parser, UnsupportedType
 
+from .compiler import compile_parser
 from .convert import get_type_name
+from .mapped import (
+    is_mapped_type,
+    make_mapped_parser,
+    make_mapped_tuple_parser,
+)
 
 
 def get_parser(param: inspect.Parameter) -> Parser:
@@ -17,16 +23,24 @@ def get_parser(param: inspect.Parameter) -> Parser:
 
     Normalizes parameter types (i.e. *args to tuple and **kwargs to dict).
     Uses str for unannotated parameters.
+    Memory-mapped types (see mapped.py) get parsers that validate paths.
+    Containers get compiled parsers (see compiler.py).
     May raise UnsupportedType (from make_parser).
     """
     hint: t.Any = str
     if param.annotation != param.empty:
         hint = param.annotation
+    if is_mapped_type(hint):
+        if param.kind == param.VAR_POSITIONAL:
+            return make_mapped_tuple_parser(hint)
+        if param.kind == param.VAR_KEYWORD:
+            raise UnsupportedType(t.Dict[str, hint])
+        return make_mapped_parser(hint)
     if param.kind == param.VAR_POSITIONAL:
         hint = t.Tuple[hint, ...]
     elif param.kind == param.VAR_KEYWORD:
         hint = t.Dict[str, hint]
-    return make_parser(hint)
+    return compile_parser(hint)
 
 
 class ArgumentTag(enum.Enum):
@@ -35,6 +49,7 @@ class ArgumentTag(enum.Enum):
     OPT = enum.auto()
     SWITCH = enum.auto()
     TOGGLE = enum.auto()
+    RESOURCE = enum.auto()
 
 
 @dataclasses.dataclass
@@ -47,6 +62,9 @@ class Argument:
 
     def fill_in(self, param: inspect.Parameter) -> None:
         """Fill in unset members based on parameter signature."""
+        if self.tag == ArgumentTag.RESOURCE:
+            self._fill_in_resource(param)
+            return
         if self.parser is None:
             try:
                 self.parser = get_parser(param)
@@ -76,22 +94,66 @@ class Argument:
         elif self.tag == ArgumentTag.OPT:
             pass
         else:
-            self.kwargs.pop("nargs", None)
-            const = ["0"]
-            default = ["1"]
-            if param.default is not True or self.tag == ArgumentTag.SWITCH:
-                const = ["1"]
-                default = ["0"]
-            self.kwargs.update(dict(
-                action="store_const",
-                const=const,
-                default=default,
-                required=False,
-            ))
-
-    def add_to(self, parser: argparse.ArgumentParser) -> None:
-        """Add argument to ArgumentParser."""
-        parser.add_argument(*self.args, **self.kwargs)
+            self._fill_in_flag(param)
+
+    def _fill_in_flag(self, param: inspect.Parameter) -> None:
+        """Fill in switch or toggle."""
+        self.kwargs.pop("nargs", None)
+        const = ["0"]
+        default = ["1"]
+        if param.default is not True or self.tag == ArgumentTag.SWITCH:
+            const = ["1"]
+            default = ["0"]
+        self.kwargs.update(dict(
+            action="store_const",
+            const=const,
+            default=default,
+            required=False,
+        ))
+
+    def _fill_in_resource(self, param: inspect.Parameter) -> None:
+        """Fill in resource name."""
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            raise TypeError(f"variadic resource parameter: {param.name}")
+        self.kwargs.setdefault("name", param.name)
+
+    def add_to(self,
+               parser: argparse.ArgumentParser,
+               default: t.Optional[t.Sequence[str]] = None,
+               optional: bool = False) -> None:
+        """Add argument to ArgumentParser.
+
+        default overrides the default tokens of named arguments (e.g. from a
+        config file). The tokens get converted by the same parser as
+        command-line tokens. Positional arguments ignore it.
+        If optional is True, arguments aren't required (e.g. the pipe
+        parameter, which can get its value from the previous stage of a
+        pipeline). Positional arguments then take their tokens only if
+        there are any.
+        Resources don't get added.
+        """
+        if self.tag == ArgumentTag.RESOURCE:
+            return
+        kwargs = self.kwargs
+        if self.tag != ArgumentTag.ARG:
+            if default is not None:
+                kwargs = dict(kwargs, default=list(default), required=False)
+            elif optional:
+                kwargs = dict(kwargs, required=False)
+        elif optional and kwargs.get("nargs") not in ("?", "*"):
+            kwargs = dict(kwargs, nargs="*", action=OptionalTokens)
+        parser.add_argument(*self.args, **kwargs)
+
+
+class OptionalTokens(argparse.Action):
+    """Store tokens of optional positional argument, or None if there are
+    no tokens (so that the parameter gets its default value)."""
+    def __call__(self,
+                 parser: argparse.ArgumentParser,
+                 namespace: argparse.Namespace,
+                 values: t.Any,
+                 option_string: t.Optional[str] = None) -> None:
+        setattr(namespace, self.dest, values or None)
 
 
 def arg(*, parser: t.Optional[Parser] = None, **kwargs: t.Any) -> Argument:
@@ -124,6 +186,16 @@ def toggle(*flags: str, **kwargs: t.Any) -> Argument:
     return Argument(ArgumentTag.TOGGLE, flags, kwargs)
 
 
+def resource(name: t.Optional[str] = None) -> Argument:
+    """Create parameter that gets a pooled resource from the Cli.
+
+    The parameter isn't exposed on the command line. name defaults to the
+    name of the parameter (see Cli.add_resource).
+    """
+    kwargs = {} if name is None else {"name": name}
+    return Argument(ArgumentTag.RESOURCE, kwargs=kwargs)
+
+
 class InvalidFlag(ValueError):
     """Invalid option flag.
 
@@ -138,4 +210,4 @@ def _check_flags(flags: t.Sequence[str]) -> None:
             raise InvalidFlag(flag)
 
 
-__all__ = ["InvalidFlag", "arg", "opt", "switch", "toggle"]
+__all__ = ["InvalidFlag", "arg", "opt", "resource", "switch", "toggle"]
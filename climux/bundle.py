@@ -0,0 +1,131 @@
+"""Bundle climux apps into zipapps with precompiled bytecode."""
+
+import importlib.util
+import marshal
+import os
+from pathlib import Path
+import stat
+import sys
+import typing as t
+import zipfile
+
+from .args import arg, switch, toggle
+from .cli import run
+from .command import Command
+
+
+# Trims sys.path when the bundle is run as `python app.pyz` without -I -S.
+BOOTSTRAP = """\
+import os
+import sys
+import sysconfig
+site = set()
+for base in (sys.prefix, sys.base_prefix):
+    bases = dict(base=base, platbase=base)
+    for paths in (sysconfig.get_paths(vars=bases),
+                  sysconfig.get_paths(os.name + "_user", vars=bases)):
+        site.update(paths[key] for key in ("purelib", "platlib"))
+sys.path[:] = [sys.path[0]] + [
+    p for p in sys.path[1:]
+    if p not in site
+    and not p.endswith(("site-packages", "dist-packages", ".egg"))
+]
+import runpy
+runpy.run_module("__climux_main__", run_name="__main__", alter_sys=True)
+"""
+
+
+def compile_pyc(source: bytes, filename: str) -> bytes:
+    """Compile source into .pyc with unchecked hash-based header.
+
+    The header doesn't depend on modification times, so zipimport never
+    looks for the source.
+    """
+    code = compile(source, filename, "exec", dont_inherit=True)
+    flags = 0b01    # hash-based, don't check source
+    return b"".join([
+        importlib.util.MAGIC_NUMBER,
+        flags.to_bytes(4, "little"),
+        importlib.util.source_hash(source),
+        marshal.dumps(code),
+    ])
+
+
+def find_sources(name: str) -> t.Iterator[t.Tuple[Path, str]]:
+    """Find source files of module or package.
+
+    Yields (path, archive name of path) pairs.
+    """
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.origin is None:
+        raise ModuleNotFoundError(name)
+    origin = Path(spec.origin)
+    if not spec.submodule_search_locations:
+        yield origin, origin.name
+        return
+
+    root = origin.parent
+    for path in sorted(root.rglob("*")):
+        if "__pycache__" in path.parts or not path.is_file():
+            continue
+        prefix = name.replace(".", "/")
+        yield path, f"{prefix}/{path.relative_to(root).as_posix()}"
+
+
+def write_module(archive: zipfile.ZipFile,
+                 path: Path,
+                 name: str,
+                 sources: bool) -> None:
+    """Write module into archive as bytecode (and optionally as source).
+
+    Non-Python files (e.g. py.typed) are copied as-is.
+    """
+    data = path.read_bytes()
+    if not name.endswith(".py"):
+        archive.writestr(name, data)
+        return
+    archive.writestr(name[:-3] + ".pyc", compile_pyc(data, name))
+    if sources:
+        archive.writestr(name, data)
+
+
+def bundle(script: Path,
+           output: Path,
+           *packages: str,
+           isolated: bool = True,
+           sources: bool = False) -> Path:
+    """Bundle script with climux, infer_parser and packages into zipapp.
+
+    Modules get precompiled for the current Python version, so the bundle
+    should be run with the same version.
+    If isolated is True, the bundle runs with `python -I -S`, which skips
+    site-packages and environment variables.
+    """
+    interpreter = sys.executable + (" -IS" if isolated else "")
+    with open(output, "wb") as file:
+        file.write(f"#!{interpreter}\n".encode())
+        with zipfile.ZipFile(file, "w", zipfile.ZIP_STORED) as archive:
+            archive.writestr("__main__.py", BOOTSTRAP)
+            archive.writestr("__climux_main__.pyc",
+                             compile_pyc(script.read_bytes(), script.name))
+            for package in ("climux", "infer_parser", *packages):
+                for path, name in find_sources(package):
+                    write_module(archive, path, name, sources)
+
+    mode = os.stat(output).st_mode
+    os.chmod(output, mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return output
+
+
+__all__ = ["bundle"]
+
+
+if __name__ == "__main__":
+    run(Command(bundle, custom=dict(
+        script=arg(help="Python script that runs the CLI"),
+        output=arg(help="output zipapp"),
+        packages=arg(help="packages to include in the bundle"),
+        isolated=toggle("--no-isolation",
+                        help="don't run bundle with python -I -S"),
+        sources=switch("--sources", help="include source files"),
+    ), show_result=False))
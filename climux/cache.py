@@ -0,0 +1,245 @@
+"""Caches of command results and parsed arguments."""
+
+import collections
+import hashlib
+import inspect
+import os
+from pathlib import Path
+import pickle
+import threading
+import time
+import types
+import typing as t
+
+from .utils import get_cache_dir
+
+
+Function = t.Callable[..., t.Any]
+
+
+def normalize(value: t.Any) -> t.Any:
+    """Replace paths in value with their modification time and size.
+
+    Recurses into tuples, lists and dicts, because *args and **kwargs and
+    containers of paths are common.
+    """
+    if isinstance(value, os.PathLike):
+        path = os.fspath(value)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return ("path", os.path.abspath(path), None, None)
+        return ("path", os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if isinstance(value, (tuple, list)):
+        return (type(value).__name__, tuple(normalize(v) for v in value))
+    if isinstance(value, dict):
+        return ("dict", tuple((k, normalize(v)) for k, v in value.items()))
+    return value
+
+
+# Types of closure variables that identify functions made by factories.
+CONSTANT_TYPES = (type(None), bool, int, float, complex, str, bytes, tuple,
+                  frozenset)
+
+
+def describe_code(code: types.CodeType) -> t.Tuple[t.Any, ...]:
+    """Describe bytecode and constants, including nested functions."""
+    consts = tuple(
+        describe_code(const) if isinstance(const, types.CodeType) else const
+        for const in code.co_consts
+    )
+    return code.co_code, consts
+
+
+def describe_function(function: Function) -> t.Tuple[t.Any, ...]:
+    """Describe function so that edited functions get different keys.
+
+    Includes the bytecode, constants and defaults of the function, and its
+    closure variables of constant types (e.g. arguments of the factory that
+    made it).
+    """
+    function = inspect.unwrap(function)
+    code = getattr(function, "__code__", None)
+    if code is None:
+        return (function.__module__, function.__qualname__)
+    closure = tuple(
+        cell.cell_contents
+        for cell in getattr(function, "__closure__", None) or ()
+        if isinstance(cell.cell_contents, CONSTANT_TYPES)
+    )
+    return (
+        function.__module__,
+        function.__qualname__,
+        describe_code(code),
+        getattr(function, "__defaults__", None),
+        getattr(function, "__kwdefaults__", None),
+        closure,
+    )
+
+
+class ResultCache:
+    """On-disk cache of function results with size and TTL-based eviction.
+
+    Least recently used entries get evicted first when the cache is larger
+    than max_size bytes.
+    Entries older than ttl seconds are ignored and evicted, even if they're
+    still being used.
+    The modification time of an entry is its creation time, and its access
+    time is the last time it was used.
+    """
+    def __init__(self,
+                 path: t.Optional[Path] = None,
+                 max_size: int = 64 * 2**20,
+                 ttl: t.Optional[float] = None):
+        self.path = path if path is not None else get_cache_dir() / "results"
+        self.max_size = max_size
+        self.ttl = ttl
+
+    def key(self,
+            function: Function,
+            args: t.Sequence[t.Any],
+            kwargs: t.Mapping[str, t.Any]) -> t.Optional[str]:
+        """Compute cache key of function call.
+
+        The key changes when the function's code, constants or defaults
+        change (see describe_function).
+        Returns None if the arguments can't be pickled.
+        """
+        try:
+            data = pickle.dumps((describe_function(function),
+                                 normalize(args), normalize(kwargs)))
+        except Exception:  # pylint: disable=broad-except
+            return None
+        return hashlib.sha256(data).hexdigest()
+
+    def _expired(self, mtime: float, now: float) -> bool:
+        """Check if entry with given modification time is expired."""
+        return self.ttl is not None and now - mtime > self.ttl
+
+    def get(self, key: str) -> t.Tuple[bool, t.Any]:
+        """Return (True, result) if key is in cache, or (False, None)."""
+        entry = self.path / f"{key}.pickle"
+        try:
+            stat = entry.stat()
+            if self._expired(stat.st_mtime, time.time()):
+                entry.unlink()
+                return False, None
+            with open(entry, "rb") as file:
+                result = pickle.load(file)
+            os.utime(entry, ns=(time.time_ns(), stat.st_mtime_ns))
+        except Exception:  # pylint: disable=broad-except
+            return False, None
+        return True, result
+
+    def put(self, key: str, result: t.Any) -> None:
+        """Store result in cache (if it can be pickled) and evict entries."""
+        try:
+            data = pickle.dumps(result)
+        except Exception:  # pylint: disable=broad-except
+            return
+        if len(data) > self.max_size:
+            return
+        entry = self.path / f"{key}.pickle"
+        temp = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            temp.write_bytes(data)
+            os.replace(temp, entry)
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Delete expired entries, then least recently used entries until the
+        cache is no larger than max_size."""
+        now = time.time()
+        entries = []
+        for entry in self.path.glob("*.pickle"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if self._expired(stat.st_mtime, now):
+                entry.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_atime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+    def call(self,
+             function: Function,
+             args: t.Sequence[t.Any],
+             kwargs: t.Mapping[str, t.Any],
+             refresh: bool = False) -> t.Any:
+        """Call function or return cached result.
+
+        If refresh is True, the cached result is ignored and replaced.
+        """
+        key = self.key(function, args, kwargs)
+        if key is None:
+            return function(*args, **kwargs)
+        if not refresh:
+            found, result = self.get(key)
+            if found:
+                return result
+        result = function(*args, **kwargs)
+        self.put(key, result)
+        return result
+
+
+class ParseCache:
+    """Bounded LRU cache of parsed and converted arguments.
+
+    Maps command-line arguments to what Cli.parse and Command.convert
+    return, so that repeated identical invocations of deterministic
+    commands skip argparse and conversion.
+    hits and misses can be used to tune max_size.
+    """
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: t.OrderedDict[t.Hashable, t.Any] = \
+            collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that were hits."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: t.Hashable) -> t.Optional[t.Any]:
+        """Get entry (or None) and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: t.Hashable, entry: t.Any) -> None:
+        """Add entry and evict least recently used entries."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove entries (e.g. when commands change)."""
+        with self._lock:
+            self._entries.clear()
+
+
+__all__ = ["ParseCache", "ResultCache"]
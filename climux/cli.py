@@ -1,51 +1,558 @@
 """Climux CLI builder and runner."""
 
 import argparse
+import contextlib
+import inspect
+import itertools
+import sys
+import threading
+import types
 import typing as t
 
-from .command import Command
+from .cache import ParseCache
+from .command import OUTPUT_DEST, Command
+from .config import Config, ConfigError
+from .convert import CantConvert, FunctionArgs
+from .limits import CantPickle, LimitExceeded
+from .output import EXIT_PIPE, OutputClosed
+from .plugins import LazyCommand, load_index, load_object
+from .pool import Resources
+from .trie import Trie
+from .utils import close_when_done
 
 SUBCOMMAND_DEST = "subcommand "
+PIPE_TOKEN = ":::"
 
+# Generations of commands of every Cli (see Cli._changed).
+_generations = itertools.count(1)
 
-class Cli:
-    """CLI builder and dispatcher."""
-    def __init__(self, prog: str, description: t.Optional[str] = None):
+# Command, parser, parsed arguments and converted arguments (or None).
+Parsed = t.Tuple[Command, "ArgumentParser", t.Dict[str, t.Any],
+                 t.Optional[FunctionArgs]]
+
+
+class UsageError(Exception):
+    """Invalid command-line arguments."""
+    def __init__(self, parser: argparse.ArgumentParser, message: str):
+        super().__init__(message)
+        self.parser = parser
+
+    def exit(self) -> t.NoReturn:
+        """Print usage and error message and exit."""
+        argparse.ArgumentParser.error(self.parser, self.args[0])
+
+
+class ArgumentParser(argparse.ArgumentParser):
+    """ArgumentParser that raises UsageError instead of exiting on error."""
+    def error(self, message: str) -> t.NoReturn:
+        raise UsageError(self, message)
+
+
+class Cli:  # pylint: disable=too-many-instance-attributes
+    """CLI builder and dispatcher.
+
+    Commands of nested groups get resources from the Cli that runs them.
+    If parse_cache is set, converted arguments of deterministic commands get
+    reused by identical invocations (see Cli.parse_cached).
+    """
+    # Changes whenever commands or groups of any Cli change, so that cached
+    # parsers of nested commands get rebuilt.
+    generation = 0
+
+    def __init__(self,
+                 prog: str,
+                 description: t.Optional[str] = None,
+                 config: t.Optional[Config] = None,
+                 parse_cache: t.Optional[ParseCache] = None):
         self.prog = prog
         self.description = description
+        self.config = config
+        self.parse_cache = parse_cache
         self.commands: t.Dict[str, Command] = {}
+        self.lazy: t.Dict[str, LazyCommand] = {}
+        self.groups: t.Dict[str, t.Union[Cli, str]] = {}
+        self.resources = Resources()
+        self._trie: t.Optional[Trie] = None
+        # Maps command path to (generation, parser).
+        self._parsers: t.Dict[t.Tuple[str, ...],
+                              t.Tuple[int, ArgumentParser]] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_module(cls,
+                    module: types.ModuleType,
+                    predicate: t.Optional[t.Callable[..., bool]] = None,
+                    prog: t.Optional[str] = None) -> "Cli":
+        """Create Cli with a command for every public function in module.
+
+        Only includes functions defined in the module, for which predicate
+        (if any) returns True.
+        Commands are created and inspected only when they're needed.
+        """
+        cli = cls(prog or module.__name__.rpartition(".")[2],
+                  description=module.__doc__)
+        for name, obj in vars(module).items():
+            if name.startswith("_") or not inspect.isfunction(obj):
+                continue
+            if obj.__module__ != module.__name__:
+                continue
+            if predicate is None or predicate(obj):
+                cli.lazy[name] = LazyCommand(name, obj)
+        return cli
+
+    @classmethod
+    def from_object(cls,
+                    obj: t.Any,
+                    predicate: t.Optional[t.Callable[..., bool]] = None,
+                    prog: t.Optional[str] = None) -> "Cli":
+        """Create Cli with a command for every public method of obj.
+
+        Only includes methods for which predicate (if any) returns True.
+        Commands are created and inspected only when they're needed.
+        """
+        cli = cls(prog or type(obj).__name__.lower(),
+                  description=type(obj).__doc__)
+        for name in dir(obj):
+            if name.startswith("_"):
+                continue
+            static = inspect.getattr_static(obj, name)
+            if not isinstance(static, (staticmethod, classmethod)) and \
+                    not inspect.isfunction(static):
+                continue
+            method = getattr(obj, name)
+            if predicate is None or predicate(method):
+                cli.lazy[name] = LazyCommand(name, method)
+        return cli
 
     def add(self, command: Command) -> None:
         """Add command."""
         self.commands[command.name] = command
+        self._changed()
+
+    def add_group(self, name: str, group: t.Union["Cli", str]) -> None:
+        """Add nested command group.
+
+        The group can be a Cli object or a "module:attr" string that names
+        one. Group modules are imported only when the group gets used.
+        """
+        self.groups[name] = group
+        self._changed()
+
+    def _changed(self) -> None:
+        """Invalidate cached parsers after commands or groups change.
+
+        Parsers cached by other Clis (e.g. of parent groups) get invalidated
+        too.
+        """
+        self._trie = None
+        Cli.generation = next(_generations)
+        if self.parse_cache is not None:
+            self.parse_cache.clear()
+
+    def add_resource(self,
+                     name: str,
+                     factory: t.Callable[[], t.Any],
+                     size: int = 1,
+                     close: t.Optional[t.Callable[[t.Any], None]] = None,
+                     ) -> None:
+        """Add pool of resources for commands with resource parameters.
+
+        Instances are created by factory when they're first needed, and
+        reused until the Cli is closed. See Pool.
+        """
+        self.resources.add(name, factory, size, close)
+
+    def close(self) -> None:
+        """Close resource pools."""
+        self.resources.close()
+
+    def __enter__(self) -> "Cli":
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.close()
+
+    def discover(self, group: str) -> None:
+        """Add commands from entry point group.
+
+        Commands are imported only when they get dispatched.
+        Doesn't replace existing commands.
+        """
+        for name, target in load_index(group).items():
+            if name not in self.commands:
+                self.lazy.setdefault(name, LazyCommand(name, target))
+        self._trie = None
+
+    def load(self, name: str) -> Command:
+        """Import lazy command (if it hasn't been loaded yet)."""
+        lazy = self.lazy.pop(name, None)
+        if lazy is not None:
+            self.commands[name] = lazy.load()
+        return self.commands[name]
+
+    def load_group(self, name: str) -> "Cli":
+        """Import command group (if it hasn't been loaded yet)."""
+        group = self.groups[name]
+        if isinstance(group, str):
+            group = load_object(group)
+            if not isinstance(group, Cli):
+                raise TypeError(f"not a Cli object: {self.groups[name]}")
+            self.groups[name] = group
+        return group
+
+    def get(self, name: str) -> Command:
+        """Get command by name.
+
+        Names of commands in nested groups are separated by spaces
+        (e.g. "db migrate").
+        Raises KeyError if there's no such command.
+        """
+        if not name.split():
+            raise KeyError(name)
+        *groups, command = name.split()
+        cli = self
+        with self._lock:
+            for group in groups:
+                cli = cli.load_group(group)
+            if command not in cli.commands and command not in cli.lazy:
+                raise KeyError(name)
+            return cli.load(command)
+
+    def call(self, name: str, /, **values: t.Any) -> t.Any:
+        """Call command with values of parameters without parsing.
+
+        Resources that aren't in values come from the Cli's pools. They're
+        held until the result is returned, or until it's exhausted or
+        closed if it's a generator.
+        See Cli.get and Command.call.
+        """
+        command = self.get(name)
+        with contextlib.ExitStack() as stack:
+            resources = self.resources.acquire(command.resources, stack,
+                                               values)
+            result = command.call(**values, **resources)
+            if inspect.isgenerator(result):
+                return close_when_done(result, stack.pop_all())
+            return result
 
-    def build(self) -> argparse.ArgumentParser:
-        """Build ArgumentParser."""
-        parser = argparse.ArgumentParser(prog=self.prog,
-                                         description=self.description)
+    def lookup(self, token: str) -> t.Optional[str]:
+        """Resolve subcommand or group name or its unique abbreviation."""
+        if not token or token.startswith("-"):
+            return None
+        if token in self.commands or token in self.lazy or \
+                token in self.groups:
+            return token
+        if self._trie is None:
+            self._trie = Trie(
+                itertools.chain(self.commands, self.lazy, self.groups)
+            )
+        return self._trie.resolve(token)
+
+    def build(self,
+              prog: t.Optional[str] = None,
+              options: bool = True,
+              *,
+              parser_class: t.Type[argparse.ArgumentParser] =
+              argparse.ArgumentParser) -> argparse.ArgumentParser:
+        """Build ArgumentParser.
+
+        Only builds the current level. Nested groups and lazy commands
+        don't get options.
+        If options is False, subcommands don't get options either.
+        """
+        parser = parser_class(prog=prog or self.prog,
+                              description=self.description)
         subparsers = parser.add_subparsers(dest=SUBCOMMAND_DEST, required=True)
         for name, command in self.commands.items():
             subparser = subparsers.add_parser(name,
                                               help=command.description,
                                               description=command.description)
-            command.set_options(subparser)
+            if options:
+                command.set_options(
+                    subparser,
+                    get_defaults(command, name, self.config),
+                )
+        for name, lazy in self.lazy.items():
+            subparsers.add_parser(name, help=lazy.description)
+        for name, group in self.groups.items():
+            description = group.description if isinstance(group, Cli) \
+                else None
+            subparsers.add_parser(name, help=description)
         return parser
 
+    def resolve(self, args: t.Sequence[str]
+                ) -> t.Tuple["Cli", t.List[str], t.Optional[Command], int]:
+        """Follow subcommand path in args.
+
+        Returns the last group, the names along the path (starting with prog),
+        the selected command (or None if there's none) and the index of the
+        first argument after the path.
+        Only the groups along the path get imported.
+        """
+        cli = self
+        path = [self.prog]
+        for index, token in enumerate(args):
+            name = cli.lookup(token)
+            if name is None:
+                break
+            path.append(name)
+            if name in cli.groups:
+                cli = cli.load_group(name)
+                continue
+            return cli, path, cli.load(name), index + 1
+        else:
+            index = len(args)
+        return cli, path, None, index
+
+    def parse(self, args_: t.Optional[t.Sequence[str]] = None
+              ) -> t.Tuple[Command, ArgumentParser, t.Dict[str, t.Any]]:
+        """Parse arguments of selected command.
+
+        Returns the command, its parser and the parsed arguments.
+        Only builds the parser of the selected command. Parsers are built
+        once and reused until commands change (see Cli._changed).
+        Raises UsageError on invalid arguments.
+        """
+        if args_ is None:
+            args_ = sys.argv[1:]
+        generation = Cli.generation
+        with self._lock:
+            cli, path, command, index = self.resolve(args_)
+            if command is None:
+                # Let argparse print help or report the error.
+                level = cli.build(" ".join(path), options=False,
+                                  parser_class=ArgumentParser)
+                level.parse_args(args_[index:])
+                raise UsageError(level, "invalid subcommand")
+            cached = self._parsers.get(tuple(path))
+            if cached is not None and cached[0] == generation:
+                parser = cached[1]
+            else:
+                parser = build_parser(command, " ".join(path), self.config,
+                                      ".".join(path[1:]))
+                self._parsers[tuple(path)] = (generation, parser)
+        args = vars(parser.parse_args(args_[index:]))
+        return command, parser, args
+
+    def parse_cached(self, args_: t.Sequence[str]) -> Parsed:
+        """Parse and convert arguments using the parse cache.
+
+        Returns the results of Cli.parse and the converted arguments, or None
+        if the command isn't cacheable (see Command.cacheable). The cache is
+        not used if the Cli has a config, because defaults can change.
+        Entries are keyed by Cli.generation, so they expire when commands or
+        groups of any Cli change.
+        Raises UsageError on invalid arguments.
+        """
+        cache = self.parse_cache
+        if cache is None or self.config is not None:
+            return (*self.parse(args_), None)
+        key = (Cli.generation, tuple(args_))
+        with self._lock:
+            command = self.resolve(args_)[2]
+        if command is None or not command.cacheable:
+            return (*self.parse(args_), None)
+        entry: t.Optional[Parsed] = cache.get(key)
+        if entry is not None:
+            return entry
+        command, parser, inputs = self.parse(args_)
+        try:
+            converted = command.convert(inputs)
+        except CantConvert as exc:
+            parser.error(exc.args[0])
+        entry = (command, parser, inputs, converted)
+        cache.put(key, entry)
+        return entry
+
+    def pipeline(self,
+                 stages: t.Sequence[t.Sequence[str]],
+                 show_result: bool = False) -> t.Any:
+        """Run commands in the same process, passing the result of each
+        command to the next command's pipe parameter as-is.
+
+        Iterators get passed without being consumed, so stages can stream.
+        Only prints the result of the last command if show_result is True.
+        Single commands use the parse cache (see Cli.parse_cached).
+        Resources are held until the last command returns, or until its
+        result is exhausted or closed if it's a generator that doesn't get
+        printed. Commands that use the same resource share one instance, so
+        pipelines don't wait for instances that they hold themselves.
+        Raises UsageError on invalid arguments, including --climux-output
+        in commands whose result doesn't get printed.
+        """
+        result = None
+        held: t.Dict[str, t.Any] = {}
+        with contextlib.ExitStack() as stack:
+            for index, stage in enumerate(stages):
+                command, parser, args, converted = self.parse_cached(stage) \
+                    if len(stages) == 1 else (*self.parse(stage), None)
+                shown = show_result and index == len(stages) - 1
+                if args.get(OUTPUT_DEST) and not shown:
+                    parser.error("argument --climux-output: not allowed "
+                                 "if the result isn't printed")
+                values = self.resources.acquire(command.resources, stack,
+                                                held=held)
+                if index > 0:
+                    if command.pipe is None:
+                        parser.error("command doesn't accept piped input")
+                    values[command.pipe] = result
+                try:
+                    if shown:
+                        result = command.invoke(args, values, converted)
+                    else:
+                        result = command.execute(args, values, converted)
+                except (CantConvert, CantPickle) as exc:
+                    parser.error(exc.args[0])
+            if inspect.isgenerator(result) and not show_result:
+                return close_when_done(result, stack.pop_all())
+            return result
+
+    def dispatch(self, args_: t.Optional[t.Sequence[str]] = None) -> t.Any:
+        """Run selected command and return the result without printing it.
+
+        Commands separated by ":::" get run as a pipeline (see Cli.pipeline
+        and split_pipeline).
+        Raises UsageError instead of exiting on invalid arguments.
+        Safe to call from multiple threads.
+        """
+        if args_ is None:
+            args_ = sys.argv[1:]
+        return self.pipeline(split_pipeline(args_))
+
     def run(self, args_: t.Optional[t.Sequence[str]] = None) -> t.Any:
-        """Run argument parser and dispatcher."""
-        args = vars(self.build().parse_args(args_))
-        command = self.commands[args[SUBCOMMAND_DEST]]
-        del args[SUBCOMMAND_DEST]
-        return command.invoke(args)
-
-
-def run(command: Command, args_: t.Optional[t.Sequence[str]] = None) -> t.Any:
-    """Build and run argument parser for single command."""
-    parser = argparse.ArgumentParser(prog=command.name,
-                                     description=command.description)
-    command.set_options(parser)
+        """Run argument parser and dispatcher.
+
+        Commands separated by ":::" get run as a pipeline (see Cli.pipeline
+        and split_pipeline).
+        Exits with status 141 (like SIGPIPE) without a traceback if the
+        output pipe gets closed.
+        """
+        if args_ is None:
+            args_ = sys.argv[1:]
+        try:
+            return self.pipeline(split_pipeline(args_), show_result=True)
+        except UsageError as exc:
+            exc.exit()
+        except LimitExceeded as exc:
+            exit_on_limit(self.prog, exc)
+        except OutputClosed:
+            sys.exit(EXIT_PIPE)
+        return None
+
+
+def split_pipeline(args: t.Sequence[str]) -> t.List[t.List[str]]:
+    """Split arguments into pipeline stages separated by ":::".
+
+    Arguments after "--" all belong to the last stage, so commands can get
+    literal ":::" arguments (e.g. `tool echo -- :::`).
+    """
+    stages: t.List[t.List[str]] = [[]]
+    for index, token in enumerate(args):
+        if token == "--":
+            stages[-1].extend(args[index:])
+            break
+        if token == PIPE_TOKEN:
+            stages.append([])
+        else:
+            stages[-1].append(token)
+    return stages
+
+
+def exit_on_limit(prog: str, exc: LimitExceeded) -> t.NoReturn:
+    """Report exceeded limit and exit with LimitExceeded.status."""
+    sys.stderr.write(f"{prog}: error: {exc}\n")
+    sys.exit(exc.status)
+
+
+def get_defaults(command: Command,
+                 section: str,
+                 config: t.Optional[Config] = None,
+                 ) -> t.Dict[str, t.List[str]]:
+    """Get default tokens of command parameters from config."""
+    if config is None:
+        return {}
+    return config.get_defaults(section, command.signature.parameters)
+
+
+def build_parser(command: Command,
+                 prog: t.Optional[str] = None,
+                 config: t.Optional[Config] = None,
+                 section: t.Optional[str] = None) -> ArgumentParser:
+    """Build ArgumentParser for single command.
+
+    Option defaults are taken from config section (command name by default).
+    Raises UsageError if the config file is invalid.
+    """
+    parser = ArgumentParser(prog=prog or command.name,
+                            description=command.description)
+    if section is None:
+        section = command.name
+    try:
+        defaults = get_defaults(command, section, config)
+    except ConfigError as exc:
+        parser.error(str(exc))
+    command.set_options(parser, defaults)
+    return parser
+
+
+def parse_command(command: Command,
+                  args_: t.Optional[t.Sequence[str]] = None,
+                  config: t.Optional[Config] = None,
+                  parse_cache: t.Optional[ParseCache] = None,
+                  ) -> t.Tuple[ArgumentParser, t.Dict[str, t.Any],
+                               t.Optional[FunctionArgs]]:
+    """Parse and convert arguments of single command.
+
+    Returns the parser, the parsed arguments and the converted arguments
+    (or None if they're not cached). See Cli.parse_cached.
+    Raises UsageError on invalid arguments.
+    """
+    if args_ is None:
+        args_ = sys.argv[1:]
+    key = (command.function, tuple(args_))
+    cacheable = parse_cache is not None and config is None and \
+        command.cacheable
+    if parse_cache is not None and cacheable:
+        entry = parse_cache.get(key)
+        if entry is not None and entry[0] is command:
+            return entry[1], entry[2], entry[3]
+
+    parser = build_parser(command, config=config)
     args = vars(parser.parse_args(args_))
-    return command.invoke(args)
+    if parse_cache is None or not cacheable:
+        return parser, args, None
+    try:
+        converted = command.convert(args)
+    except CantConvert as exc:
+        parser.error(exc.args[0])
+    parse_cache.put(key, (command, parser, args, converted))
+    return parser, args, converted
+
+
+def run(command: Command,
+        args_: t.Optional[t.Sequence[str]] = None,
+        config: t.Optional[Config] = None,
+        parse_cache: t.Optional[ParseCache] = None) -> t.Any:
+    """Build and run argument parser for single command.
+
+    See Cli.run. parse_cache works like in Cli.
+    """
+    prog = command.name
+    try:
+        parser, args, converted = parse_command(command, args_, config,
+                                                parse_cache)
+        prog = parser.prog
+        try:
+            return command.invoke(args, converted=converted)
+        except (CantConvert, CantPickle) as exc:
+            parser.error(exc.args[0])
+    except UsageError as exc:
+        exc.exit()
+    except LimitExceeded as exc:
+        exit_on_limit(prog, exc)
+    except OutputClosed:
+        sys.exit(EXIT_PIPE)
+    return None
 
 
-__all__ = ["Cli", "run"]
+__all__ = ["Cli", "UsageError", "run"]
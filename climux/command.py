@@ -1,34 +1,115 @@
 """Climux command builder and runner."""
 
 import argparse
+import contextlib
 import dataclasses
+import functools
 import inspect
 import typing as t
 
-from .args import Argument, opt
-from .convert import CantConvert, convert
+from .args import Argument, ArgumentTag, opt
+from .cache import ResultCache
+from .convert import (
+    CantConvert, ConvertOptions, FunctionArgs, bind, check_args, convert,
+)
+from .limits import limit
+from .mapped import is_mapped_type, open_mapped
+from .output import open_output, write_result
+from .parallel import EXECUTORS, map_ordered
+from .utils import close_when_done
+from .watch import find_paths, rerun_on_change
 
 
 Function = t.Callable[..., t.Any]
 
+NO_CACHE_DEST = "no-cache "
+WATCH_DEST = "watch "
+OUTPUT_DEST = "climux-output "
+
+
+@dataclasses.dataclass(frozen=True)
+class Call:
+    """Picklable call of command function within limits (or from cache)."""
+    function: Function
+    cache: t.Optional[ResultCache] = None
+    refresh: bool = False
+    timeout: t.Optional[float] = None
+    max_memory: t.Optional[int] = None
+    max_cpu: t.Optional[float] = None
+    start_method: t.Optional[str] = None
+
+    def __call__(self, *args: t.Any, **kwargs: t.Any) -> t.Any:
+        """Raises LimitExceeded if the function exceeds its limits."""
+        function = limit(self.function, self.timeout, self.max_memory,
+                         self.max_cpu, self.start_method)
+        if self.cache is not None:
+            return self.cache.call(function, args, kwargs, self.refresh)
+        return function(*args, **kwargs)
+
+
+def call_chunk(call: Call,
+               args: t.Sequence[t.Any],
+               kwargs: t.Mapping[str, t.Any],
+               chunk: t.Sequence[t.Any]) -> t.Any:
+    """Call function with chunk of *args after the other positional args."""
+    return call(*args, *chunk, **kwargs)
+
 
 @dataclasses.dataclass
-class Command:
+class Command:  # pylint: disable=too-many-instance-attributes
     """Represent CLI commands."""
     function: Function
     alias: t.Optional[str] = None
     show_result: bool = True
     custom: t.Dict[str, Argument] = dataclasses.field(default_factory=dict)
+    # Prefix of *args/**kwargs tokens that name argument files (e.g. "@").
+    argfile_prefix: t.Optional[str] = None
+    # Memoize results (for pure functions).
+    cache: t.Optional[ResultCache] = None
+    # Wall-clock time limit (seconds). Sync functions with time limits run in
+    # a worker process so they can be killed.
+    timeout: t.Optional[float] = None
+    # Memory (bytes) and CPU time (seconds) limits, enforced with setrlimit
+    # in a worker process.
+    max_memory: t.Optional[int] = None
+    max_cpu: t.Optional[float] = None
+    # multiprocessing start method of the worker process (see
+    # call_in_worker). The command function must be importable unless it's
+    # "fork".
+    start_method: t.Optional[str] = None
+    # Parameter that receives the result of the previous command in a
+    # pipeline.
+    pipe: t.Optional[str] = None
+    # *args parameter whose elements (or chunks of elements) get passed to
+    # separate calls of the function, run in parallel by a "thread" or
+    # "process" executor. The command returns an iterator of the results in
+    # input order, with at most window calls in flight.
+    map_over: t.Optional[str] = None
+    workers: t.Optional[int] = None
+    executor: str = "thread"
+    window: t.Optional[int] = None
+    chunksize: int = 1
+    # Add --watch option that reruns the command whenever files in its Path
+    # arguments change.
+    watch: bool = False
+    # Parsers are pure and the function doesn't mutate its arguments, so
+    # converted arguments can be reused by identical invocations (see
+    # ParseCache).
+    deterministic: bool = False
+    # Report every invalid argument at once instead of only the first one.
+    all_errors: bool = False
 
-    subparser: t.Optional[argparse.ArgumentParser] = \
-        dataclasses.field(default=None, init=False)
+    signature: inspect.Signature = \
+        dataclasses.field(init=False, repr=False, compare=False)
 
     def __post_init__(self) -> None:
         """Initialize unset custom arguments."""
-        sig = inspect.signature(self.function)
-        for name in sig.parameters:
+        self.signature = inspect.signature(self.function)
+        for name in self.signature.parameters:
             self.custom.setdefault(name, opt())
         self.infer_options()
+        if self.map_over is not None:
+            self.check_map_over(self.map_over)
 
     @property
     def name(self) -> str:
@@ -42,33 +123,230 @@ class Command:
         """Get command description from function docstring."""
         return self.function.__doc__
 
+    @property
+    def resources(self) -> t.Dict[str, str]:
+        """Map resource parameters to the names of their resources."""
+        return {
+            name: arg.kwargs["name"]
+            for name, arg in self.custom.items()
+            if arg.tag == ArgumentTag.RESOURCE
+        }
+
+    @property
+    def cacheable(self) -> bool:
+        """Check if converted arguments can be cached (see ParseCache).
+
+        Commands with resources or argument files are never cached.
+        """
+        return self.deterministic and not self.resources and \
+            self.argfile_prefix is None
+
+    def check_map_over(self, name: str) -> None:
+        """Check if the command can map over parameter.
+
+        Raises ValueError if it can't.
+        """
+        param = self.signature.parameters.get(name)
+        if param is None or param.kind != param.VAR_POSITIONAL:
+            raise ValueError(f"not a *args parameter: {name}")
+        if self.executor not in EXECUTORS:
+            raise ValueError(f"unknown executor: {self.executor}")
+        if self.has_mapped_files():
+            raise ValueError("can't map over command with mapped files")
+
     def infer_options(self) -> None:
         """Infer ArgumentParser options from function signature."""
-        sig = inspect.signature(self.function)
-        for name, param in sig.parameters.items():
+        for name, param in self.signature.parameters.items():
             custom = self.custom[name]
             custom.fill_in(param)
 
-    def set_options(self, parser: argparse.ArgumentParser) -> None:
-        """Set parser options from command function signature."""
-        self.subparser = parser
-        sig = inspect.signature(self.function)
-        for param in sig.parameters.values():
-            self.custom[param.name].add_to(parser)
+    def set_options(self,
+                    parser: argparse.ArgumentParser,
+                    defaults: t.Optional[t.Mapping[str, t.Sequence[str]]]
+                    = None) -> None:
+        """Set parser options from command function signature.
+
+        defaults maps parameter names to default tokens (see Argument.add_to).
+        """
+        if defaults is None:
+            defaults = {}
+        for param in self.signature.parameters.values():
+            self.custom[param.name].add_to(parser, defaults.get(param.name),
+                                           optional=param.name == self.pipe)
+        if self.cache is not None:
+            parser.add_argument("--no-cache", action="store_true",
+                                dest=NO_CACHE_DEST,
+                                help="ignore and replace cached result")
+        if self.show_result:
+            parser.add_argument("--climux-output", dest=OUTPUT_DEST,
+                                metavar="PATH",
+                                help="write result to file (compressed if "
+                                "PATH ends with .gz, .bz2, .xz or .zst)")
+        if self.watch:
+            parser.add_argument("--watch", action="store_true",
+                                dest=WATCH_DEST,
+                                help="rerun when input files change")
+
+    def convert(self,
+                inputs: t.Mapping[str, t.Optional[t.Sequence[str]]],
+                values: t.Optional[t.Mapping[str, t.Any]] = None,
+                ) -> FunctionArgs:
+        """Convert inputs into args and kwargs of function.
 
-    def invoke(self, inputs: t.Mapping[str, t.Sequence[str]]) -> t.Any:
-        """Invoke command on argparse.Namespace dictionary."""
-        assert self.subparser is not None
+        See Command.execute.
+        """
+        missing = set(self.resources) - set(values or {})
+        if missing:
+            raise CantConvert(f"missing resource: {min(missing)}")
         parsers = {name: arg.parser for name, arg in self.custom.items()}
 
         # parsers are not null because of Argument.fill_in
-        all_args = convert(self.function, inputs, parsers)  # type: ignore
-        if isinstance(all_args, CantConvert):
-            self.subparser.error(all_args.args[0])
-        args, kwargs = all_args
-        result = self.function(*args, **kwargs)
-        if self.show_result:
-            print(result)
+        options = ConvertOptions(self.argfile_prefix, self.all_errors,
+                                 self.signature)
+        return check_args(convert(
+            self.function, inputs, parsers,  # type: ignore
+            values, options,
+        ))
+
+    def execute(self,
+                inputs: t.Mapping[str, t.Optional[t.Sequence[str]]],
+                values: t.Optional[t.Mapping[str, t.Any]] = None,
+                converted: t.Optional[FunctionArgs] = None,
+                ) -> t.Any:
+        """Run command function on argparse.Namespace dictionary.
+
+        Parameters in values (e.g. piped input and resources) skip
+        conversion.
+        converted (args and kwargs from Command.convert) skips conversion
+        altogether.
+        Raises CantConvert if inputs are invalid or if a resource is missing.
+        Doesn't modify the command, so it's safe to call from multiple
+        threads.
+        """
+        if converted is None:
+            converted = self.convert(inputs, values)
+        args, kwargs = converted
+        refresh = bool(inputs.get(NO_CACHE_DEST, False))
+        if not self.has_mapped_files():
+            return self._call(args, kwargs, refresh)
+        with contextlib.ExitStack() as stack:
+            args = open_mapped(args, stack)
+            kwargs = open_mapped(kwargs, stack)
+            result = self._call(args, kwargs, refresh)
+            if inspect.isgenerator(result):
+                return close_when_done(result, stack.pop_all())
+            return result
+
+    def has_mapped_files(self) -> bool:
+        """Check if command takes memory-mapped file parameters.
+
+        Mapped files are opened after conversion, and released after the
+        function returns. If the function returns a generator, they're
+        released when the generator is exhausted or closed.
+        """
+        return any(
+            is_mapped_type(param.annotation)
+            for param in self.signature.parameters.values()
+        )
+
+    def _call(self,
+              args: t.Sequence[t.Any],
+              kwargs: t.Mapping[str, t.Any],
+              refresh: bool = False) -> t.Any:
+        """Call function within limits (or get cached result).
+
+        Returns an iterator of results if the command maps over *args.
+        Raises LimitExceeded if the function exceeds its limits.
+        """
+        call = Call(self.function, self.cache, refresh, self.timeout,
+                    self.max_memory, self.max_cpu, self.start_method)
+        if self.map_over is None:
+            return call(*args, **kwargs)
+
+        index = sum(
+            param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD)
+            for param in self.signature.parameters.values()
+        )
+        function = functools.partial(call_chunk, call, tuple(args[:index]),
+                                     dict(kwargs))
+        return map_ordered(function, args[index:], self.workers,
+                           self.executor, self.window, self.chunksize)
+
+    def watch_files(self,
+                    inputs: t.Mapping[str, t.Sequence[str]],
+                    values: t.Optional[t.Mapping[str, t.Any]] = None,
+                    **kwargs: t.Any) -> None:
+        """Invoke command, and invoke it again whenever files in its Path
+        arguments change.
+
+        Keyword arguments are passed to watch.rerun_on_change.
+        Raises CantConvert if inputs are invalid or if there are no paths to
+        watch.
+        """
+        all_args = self.convert(inputs, values)
+        paths = find_paths(all_args)
+        if not paths:
+            raise CantConvert("argument --watch: no input files to watch")
+        inputs = dict(inputs, **{WATCH_DEST: False})
+        rerun_on_change(lambda: self.invoke(inputs, values), paths, **kwargs)
+
+    def call(self, **values: t.Any) -> t.Any:
+        """Call function on values of parameters without parsing.
+
+        *args and **kwargs are passed as a sequence and as a mapping.
+        Missing values use defaults.
+        Raises CantConvert on missing or unknown parameters.
+        """
+        args, kwargs = check_args(bind(self.function, values, self.signature))
+        return self._call(args, kwargs)
+
+    def call_tokens(self,
+                    tokens: t.Mapping[str, t.Sequence[str]],
+                    values: t.Optional[t.Mapping[str, t.Any]] = None,
+                    ) -> t.Any:
+        """Call function on string tokens of parameters without argparse.
+
+        Missing parameters use defaults.
+        Resources are passed in values (see Command.execute).
+        Raises CantConvert if tokens are invalid.
+        """
+        sig = self.signature
+        unknown = set(tokens) - (set(sig.parameters) - set(self.resources))
+        if unknown:
+            raise CantConvert(f"unknown parameter: {min(unknown)}")
+
+        inputs: t.Dict[str, t.Optional[t.Sequence[str]]] = {}
+        for name, param in sig.parameters.items():
+            variadic = param.kind in (param.VAR_POSITIONAL,
+                                      param.VAR_KEYWORD)
+            inputs[name] = tokens.get(name, [] if variadic else None)
+        return self.execute(inputs, values)
+
+    def invoke(self,
+               inputs: t.Mapping[str, t.Sequence[str]],
+               values: t.Optional[t.Mapping[str, t.Any]] = None,
+               converted: t.Optional[FunctionArgs] = None) -> t.Any:
+        """Invoke command on argparse.Namespace dictionary.
+
+        Prints the result if show_result is True (see output.write_result),
+        or writes it to the file in --climux-output.
+        Results that are generators (e.g. of commands that map over *args)
+        get printed as they're produced.
+        See Command.execute for values and converted.
+        Raises OutputClosed if the output pipe gets closed.
+        With --watch, the command reruns until interrupted (see
+        Command.watch_files) and None is returned.
+        """
+        if inputs.get(WATCH_DEST, False):
+            self.watch_files(inputs, values)
+            return None
+        result = self.execute(inputs, values, converted)
+        output = inputs.get(OUTPUT_DEST)
+        if self.show_result and output:
+            with open_output(str(output)) as file:
+                write_result(result, file)
+        elif self.show_result:
+            write_result(result)
         return result
 
 
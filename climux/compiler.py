@@ -0,0 +1,180 @@
+"""Compile parsers of nested container types into flat functions.
+
+infer_parser builds parsers of types like Dict[str, Tuple[float, float]] out
+of nested closures that slice the tokens at every level. compile_parser
+generates a single function that indexes the tokens directly instead,
+because the number of tokens per element is known in advance.
+"""
+
+import typing as t
+
+from infer_parser import CantParse, Parser, make_parser
+
+
+# Maps token offset (relative to the current element) to an expression.
+Index = t.Callable[[int], str]
+
+WRAPPERS = (getattr(t, "Annotated"), getattr(t, "Final"))
+
+TEMPLATE = """\
+def parse(tokens):
+    if {check}:
+        raise CantParse(hint, tokens)
+    try:
+        return {expr}
+    except Exception as exc:
+        raise CantParse(hint, tokens) from exc
+"""
+
+
+def unwrap(hint: t.Any) -> t.Any:
+    """Strip Annotated and Final from hint."""
+    while t.get_origin(hint) in WRAPPERS:
+        hint = t.get_args(hint)[0]
+    return hint
+
+
+def is_fixed_tuple(hint: t.Any) -> bool:
+    """Check if hint is a fixed-length tuple type."""
+    args = t.get_args(hint)
+    return t.get_origin(hint) in (tuple, t.Tuple) and bool(args) and \
+        ... not in args
+
+
+def get_length(hint: t.Any) -> t.Optional[int]:
+    """Get number of tokens taken by hint, or None if it's not fixed."""
+    length = make_parser(hint).length
+    return length if isinstance(length, int) else None
+
+
+class Builder:
+    """Generate source code of parse function."""
+    def __init__(self, hint: t.Any):
+        self.namespace: t.Dict[str, t.Any] = {
+            "CantParse": CantParse,
+            "hint": hint,
+        }
+
+    def bind(self, value: t.Any) -> str:
+        """Add value to namespace of generated function and return its name."""
+        name = f"_{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def fixed(self,
+              hint: t.Any,
+              token_at: Index,
+              offset: int = 0) -> t.Optional[t.Tuple[str, int]]:
+        """Generate expression that converts the tokens of one element.
+
+        Returns (expression, number of tokens), or None if the hint doesn't
+        take a fixed number of tokens.
+        Simple types get called on tokens directly. Other types with fixed
+        lengths (e.g. unions) get their infer_parser parser.
+        """
+        hint = unwrap(hint)
+        if is_fixed_tuple(hint):
+            parts = []
+            start = offset
+            for arg in t.get_args(hint):
+                part = self.fixed(arg, token_at, offset)
+                if part is None:
+                    return None
+                parts.append(part[0])
+                offset += part[1]
+            return f"({', '.join(parts)},)", offset - start
+
+        parser = make_parser(hint)
+        if not isinstance(parser.length, int):
+            return None
+        function = getattr(parser.function, "__wrapped__", None)
+        if function is not None and parser.length == 1:
+            return f"{self.bind(function)}({token_at(offset)})", 1
+        tokens = ", ".join(
+            token_at(offset + k) for k in range(parser.length)
+        )
+        return f"{self.bind(parser)}([{tokens}])", parser.length
+
+    def loop(self,
+             elements: t.Sequence[t.Any]
+             ) -> t.Optional[t.Tuple[str, t.List[str], int]]:
+        """Generate loop over groups of tokens.
+
+        Returns (loop, element expressions, group size) or None if any
+        element doesn't take a fixed number of tokens.
+        """
+        lengths = [get_length(element) for element in elements]
+        if None in lengths:
+            return None
+        size = sum(t.cast(t.List[int], lengths))
+
+        def index(k: int) -> str:
+            if size == 1:
+                return "token"
+            return f"tokens[i + {k}]" if k else "tokens[i]"
+
+        parts = []
+        offset = 0
+        for element in elements:
+            part = self.fixed(element, index, offset)
+            assert part is not None
+            parts.append(part[0])
+            offset += part[1]
+
+        if size == 1:
+            return "for token in tokens", parts, size
+        return f"for i in range(0, len(tokens), {size})", parts, size
+
+    def generate(self, hint: t.Any) -> t.Optional[t.Tuple[str, str]]:
+        """Generate (length check, return expression) of parse function.
+
+        Returns None if the hint isn't a container of fixed-length elements.
+        """
+        origin = t.get_origin(hint)
+        args = t.get_args(hint)
+        if is_fixed_tuple(hint):
+            fixed = self.fixed(hint, lambda k: f"tokens[{k}]")
+            if fixed is None:
+                return None
+            return f"len(tokens) != {fixed[1]}", fixed[0]
+
+        if origin in (list, t.List) and len(args) == 1:
+            loop = self.loop(args)
+            template = "[{0} {loop}]"
+        elif origin in (tuple, t.Tuple) and args[1:] == (...,):
+            loop = self.loop(args[:1])
+            template = "tuple([{0} {loop}])"
+        elif origin in (dict, t.Dict) and len(args) == 2:
+            loop = self.loop(args)
+            template = "{{{0}: {1} {loop}}}"
+        else:
+            return None
+
+        if loop is None:
+            return None
+        source, parts, size = loop
+        return f"len(tokens) % {size}", template.format(*parts, loop=source)
+
+
+def compile_parser(hint: t.Any) -> Parser:
+    """Make parser for type hint.
+
+    Containers of fixed-length elements (e.g. List[Tuple[str, int]],
+    Tuple[float, ...], Dict[str, Tuple[float, float]]) get compiled
+    parsers. Other types (e.g. Optional[int]) fall back to make_parser.
+    May raise UnsupportedType (from make_parser).
+    """
+    parser = make_parser(hint)
+    builder = Builder(hint)
+    generated = builder.generate(unwrap(hint))
+    if generated is None:
+        return parser
+
+    check, expr = generated
+    source = TEMPLATE.format(check=check, expr=expr)
+    code = compile(source, f"<climux parser for {hint}>", "exec")
+    exec(code, builder.namespace)  # pylint: disable=exec-used
+    return Parser(hint, builder.namespace["parse"], parser.length)
+
+
+__all__ = ["compile_parser"]
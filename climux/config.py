@@ -0,0 +1,198 @@
+"""Option defaults from config files and environment variables."""
+
+import configparser
+import hashlib
+import importlib
+import json
+import os
+from pathlib import Path
+import shlex
+import typing as t
+
+from .utils import get_cache_dir
+
+
+# section -> parameter name -> tokens
+Defaults = t.Dict[str, t.Dict[str, t.List[str]]]
+
+
+class ConfigError(Exception):
+    """Invalid config file."""
+
+
+def to_tokens(value: t.Any) -> t.List[str]:
+    """Convert TOML value into tokens."""
+    if isinstance(value, bool):
+        return ["true" if value else "false"]
+    if isinstance(value, (list, tuple)):
+        return [token for item in value for token in to_tokens(item)]
+    return [str(value)]
+
+
+def flatten(table: t.Mapping[str, t.Any],
+            section: str = "",
+            result: t.Optional[Defaults] = None) -> Defaults:
+    """Flatten nested TOML tables into sections.
+
+    Nested tables like [db.migrate] become section "db.migrate".
+    Top-level keys go in section "".
+    """
+    if result is None:
+        result = {}
+    for key, value in table.items():
+        if isinstance(value, dict):
+            flatten(value, f"{section}.{key}" if section else key, result)
+        else:
+            result.setdefault(section, {})[key] = to_tokens(value)
+    return result
+
+
+def parse_toml(path: Path) -> Defaults:
+    """Parse TOML config file.
+
+    Uses tomllib (Python 3.11+) or the tomli package.
+    Raises ConfigError if neither is available.
+    """
+    for name in ("tomllib", "tomli"):
+        try:
+            tomllib = importlib.import_module(name)
+        except ImportError:
+            continue
+        with open(path, "rb") as file:
+            return flatten(tomllib.load(file))
+    raise ConfigError(
+        f"{path}: TOML config files require the tomli package "
+        "(pip install tomli)"
+    )
+
+
+def parse_ini(path: Path) -> Defaults:
+    """Parse INI config file.
+
+    Values are split into tokens like in a shell.
+    Values in [DEFAULT] apply to every section.
+    """
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str  # type: ignore
+    parser.read(path)
+    result: Defaults = {}
+    for section in parser.sections():
+        result[section] = {
+            key: shlex.split(value)
+            for key, value in parser[section].items()
+        }
+    result[""] = {
+        key: shlex.split(value) for key, value in parser.defaults().items()
+    }
+    return result
+
+
+class Config:
+    """Option defaults from a TOML/INI file and environment variables.
+
+    Defaults of a command named "db migrate" are in section [db.migrate], or
+    in environment variables like PREFIX_DB_MIGRATE_VERSION.
+    Environment variables take precedence over the config file.
+    The parsed config file is cached on disk and only parsed again when
+    the file's path, modification time or size changes.
+    """
+    def __init__(self,
+                 path: t.Optional[t.Union[str, Path]] = None,
+                 env_prefix: t.Optional[str] = None,
+                 cache: bool = True):
+        self.path = Path(path) if path is not None else None
+        self.env_prefix = env_prefix
+        self.cache = cache
+        self._defaults: t.Optional[Defaults] = None
+
+    def get_cache_path(self, stat: os.stat_result) -> Path:
+        """Get path to cached config."""
+        assert self.path is not None
+        key = f"{self.path.resolve()}\0{stat.st_mtime_ns}\0{stat.st_size}"
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return get_cache_dir() / "config" / f"{name}.json"
+
+    def parse(self) -> Defaults:
+        """Parse config file (without the on-disk cache).
+
+        Raises ConfigError if the file can't be read or parsed.
+        """
+        assert self.path is not None
+        try:
+            if self.path.suffix == ".toml":
+                return parse_toml(self.path)
+            return parse_ini(self.path)
+        except (OSError, ValueError, configparser.Error) as exc:
+            raise ConfigError(f"{self.path}: {exc}") from exc
+
+    def load(self) -> Defaults:
+        """Load parsed config file.
+
+        Raises ConfigError if the file is invalid. Invalid files aren't
+        remembered, so every call raises ConfigError until they're fixed.
+        """
+        if self._defaults is None:
+            self._defaults = self._read()
+        return self._defaults
+
+    def _read(self) -> Defaults:
+        """Read config file (from the on-disk cache if enabled)."""
+        if self.path is None:
+            return {}
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return {}
+        if not self.cache:
+            return self.parse()
+
+        cache_path = self.get_cache_path(stat)
+        try:
+            return t.cast(Defaults, json.loads(cache_path.read_text()))
+        except (OSError, ValueError):
+            pass
+        defaults = self.parse()
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+            temp.write_text(json.dumps(defaults))
+            os.replace(temp, cache_path)
+        except OSError:
+            pass
+        return defaults
+
+    def get_env_name(self, section: str, name: str) -> t.Optional[str]:
+        """Get name of environment variable for parameter."""
+        if self.env_prefix is None:
+            return None
+        parts = [self.env_prefix, *section.split("."), name]
+        return "_".join(p for p in parts if p).upper().replace("-", "_")
+
+    def lookup(self, section: str, name: str) -> t.Optional[t.List[str]]:
+        """Get default tokens of parameter in section.
+
+        Returns None if there's no default.
+        """
+        env_name = self.get_env_name(section, name)
+        if env_name is not None and env_name in os.environ:
+            return shlex.split(os.environ[env_name])
+        defaults = self.load()
+        for key in (section, ""):
+            tokens = defaults.get(key, {}).get(name)
+            if tokens is not None:
+                return tokens
+        return None
+
+    def get_defaults(self,
+                     section: str,
+                     names: t.Iterable[str]) -> t.Dict[str, t.List[str]]:
+        """Get default tokens of parameters in section."""
+        result = {}
+        for name in names:
+            tokens = self.lookup(section, name)
+            if tokens is not None:
+                result[name] = tokens
+        return result
+
+
+__all__ = ["Config", "ConfigError"]
@@ -1,19 +1,60 @@
 """Convert argparse parsed args to function args."""
 
+import dataclasses
 import inspect
+import itertools
 import shlex
 import types
 import typing as t
 
-from infer_parser import Parser
+from infer_parser import Parser, UnsupportedType
+
+from .argfile import expand_tokens
+from .compiler import get_length, unwrap
 
 
 Function = t.Callable[..., t.Any]
 FunctionArgs = t.Tuple[t.Tuple[t.Any, ...], t.Dict[str, t.Any]]
 
+# Number of *args/**kwargs elements parsed at a time from argument files.
+STREAM_BATCH_SIZE = 1024
+
 
 class CantConvert(Exception):
-    """Returned by convert function on failure."""
+    """Returned by convert function on failure.
+
+    errors contains the errors of every invalid parameter if they were
+    collected (see convert), or just this error.
+    """
+    def __init__(self,
+                 message: str,
+                 errors: t.Optional[t.List["CantConvert"]] = None):
+        super().__init__(message)
+        self.errors = errors if errors is not None else [self]
+
+
+@dataclasses.dataclass(frozen=True)
+class ConvertOptions:
+    """Options of convert.
+
+    See convert_value for argfile_prefix.
+    If all_errors is True, every parameter gets converted even after a
+    failure, and the errors are combined (see combine_errors).
+    Pass the function signature to avoid recomputing it.
+    """
+    argfile_prefix: t.Optional[str] = None
+    all_errors: bool = False
+    signature: t.Optional[inspect.Signature] = None
+
+
+def combine_errors(errors: t.Sequence[CantConvert]) -> CantConvert:
+    """Combine errors into one error with a message per line."""
+    assert errors
+    if len(errors) == 1:
+        return errors[0]
+    lines = [f"{len(errors)} invalid arguments:"]
+    lines.extend(f"  {error.args[0]}" for error in errors)
+    return CantConvert("\n".join(lines), list(errors))
 
 
 def collect_annotation(param: inspect.Parameter) -> t.Any:
@@ -44,36 +85,147 @@ def get_type_name(param: inspect.Parameter) -> str:
     return str(getattr(hint, "__name__", hint))
 
 
+def invalid_value(param: inspect.Parameter,
+                  tokens: t.Sequence[str]) -> CantConvert:
+    """Create CantConvert error for tokens that failed to parse."""
+    message = "argument {}: invalid value: '{}'".format(
+        param.name,
+        shlex.join(tokens),
+    )
+    if param.annotation != param.empty:
+        type_name = get_type_name(param)
+        message += f" (expected {type_name})"
+    return CantConvert(message)
+
+
+def invalid_item(param: inspect.Parameter,
+                 parser: Parser,
+                 tokens: t.Sequence[str],
+                 size: int,
+                 start: int) -> CantConvert:
+    """Create CantConvert error for the first invalid element in a batch of
+    *args or **kwargs tokens.
+
+    The error names the element's index (counting from start) and only its
+    tokens, so it stays short even if the batch is large.
+    """
+    for offset in range(0, len(tokens), size):
+        group = tokens[offset:offset + size]
+        try:
+            parser(group)
+        except ValueError:
+            break
+    error = invalid_value(param, group)
+    index = start + offset // size
+    return CantConvert(error.args[0].replace(
+        "invalid value:", f"invalid value at item {index}:", 1
+    ))
+
+
+def get_group_size(param: inspect.Parameter,
+                   parser: Parser) -> t.Optional[int]:
+    """Get number of tokens per element of *args or **kwargs.
+
+    The element types come from the hint of the parameter's parser (e.g.
+    Tuple[T, ...] for *args or Dict[K, V] for **kwargs), so custom parsers
+    get the size of their own elements.
+    Returns None if the element type doesn't take a fixed number of tokens.
+    """
+    hint = unwrap(parser.hint)
+    origin, args = t.get_origin(hint), t.get_args(hint)
+    if param.kind == param.VAR_POSITIONAL and origin is tuple and \
+            len(args) == 2 and args[1] is ...:
+        elements = args[:1]
+    elif param.kind == param.VAR_KEYWORD and origin is dict and args:
+        elements = args
+    else:
+        return None
+    try:
+        lengths = [get_length(element) for element in elements]
+    except UnsupportedType:
+        return None
+    if None in lengths:
+        return None
+    size = sum(t.cast(t.List[int], lengths))
+    return size if size > 0 else None
+
+
+def convert_stream(param: inspect.Parameter,
+                   parser: Parser,
+                   tokens: t.Sequence[str],
+                   argfile_prefix: str,
+                   ) -> t.Union[t.Any, CantConvert]:
+    """Convert *args or **kwargs tokens that may contain argument files.
+
+    Tokens are parsed in batches, so only the converted values are kept in
+    memory.
+    Assumes param is variadic.
+    """
+    assert param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD)
+    size = get_group_size(param, parser)
+    if size is None:
+        return CantConvert(
+            f"argument {param.name}: argument files not supported"
+        )
+
+    values: t.List[t.Any] = []
+    items: t.Dict[t.Any, t.Any] = {}
+    stream = expand_tokens(tokens, argfile_prefix)
+    start = 0
+    try:
+        while True:
+            batch = list(itertools.islice(stream, STREAM_BATCH_SIZE * size))
+            if not batch:
+                break
+            try:
+                value = parser(batch)
+            except ValueError:
+                return invalid_item(param, parser, batch, size, start)
+            start += len(batch) // size
+            if param.kind == param.VAR_POSITIONAL:
+                values.extend(value)
+            else:
+                items.update(value)
+    except (OSError, UnicodeDecodeError) as exc:
+        return CantConvert(
+            f"argument {param.name}: can't read argument file: {exc}"
+        )
+    if param.kind == param.VAR_POSITIONAL:
+        return tuple(values)
+    return items
+
+
 def convert_value(param: inspect.Parameter,
                   parser: Parser,
-                  tokens: t.Optional[t.Sequence[str]] = None
+                  tokens: t.Optional[t.Sequence[str]] = None,
+                  argfile_prefix: t.Optional[str] = None,
                   ) -> t.Union[t.Any, CantConvert]:
     """Convert tokens to value.
 
     None tokens means to use the default value.
+    If argfile_prefix is set, *args and **kwargs tokens that start with the
+    prefix are replaced with the tokens in the named file.
     """
     name = param.name
     if tokens is None:
         if param.default == param.empty:
             return CantConvert(f"missing parameter: {name}")
         return param.default
+    if argfile_prefix and \
+            param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD) and \
+            any(token.startswith(argfile_prefix) for token in tokens):
+        return convert_stream(param, parser, tokens, argfile_prefix)
     try:
         return parser(tokens)
     except ValueError:
-        message = "argument {}: invalid value: '{}'".format(
-            name,
-            shlex.join(tokens),
-        )
-        if param.annotation != param.empty:
-            type_name = get_type_name(param)
-            message += f" (expected {type_name})"
-            return CantConvert(message)
-        return CantConvert(message)
+        return invalid_value(param, tokens)
 
 
 def convert(func: Function,
             inputs: t.Mapping[str, t.Optional[t.Sequence[str]]],
             custom_parsers: t.Optional[t.Mapping[str, Parser]] = None,
+            values: t.Optional[t.Mapping[str, t.Any]] = None,
+            options: t.Optional[ConvertOptions] = None,
             ) -> t.Union[FunctionArgs, CantConvert]:
     """Construct args and kwargs for function from argparse inputs.
 
@@ -83,16 +235,74 @@ def convert(func: Function,
     Raise error if there's no default.
 
     The custom parsers are defined by climux.Command.
+    Parameters in values are used as-is and skip conversion.
+    See ConvertOptions for options.
     """
     if custom_parsers is None:
         custom_parsers = {}
+    if options is None:
+        options = ConvertOptions()
+
+    converted = dict(values or {})
+    sig = options.signature
+    if sig is None:
+        sig = inspect.signature(func)
+
+    errors = []
+    for name, param in sig.parameters.items():
+        if name in converted:
+            continue
+        value = convert_value(param, custom_parsers[name], inputs[name],
+                              options.argfile_prefix)
+        if isinstance(value, CantConvert):
+            if not options.all_errors:
+                return value
+            errors.append(value)
+        converted[name] = value
+    if errors:
+        return combine_errors(errors)
+    return bind(func, converted, sig)
+
 
+def check_args(result: t.Union[FunctionArgs, CantConvert]) -> FunctionArgs:
+    """Return args and kwargs from convert or bind, or raise CantConvert."""
+    if isinstance(result, CantConvert):
+        raise result
+    return result
+
+
+def get_default(param: inspect.Parameter) -> t.Union[t.Any, CantConvert]:
+    """Get default value of parameter (empty for *args and **kwargs)."""
+    if param.kind == param.VAR_POSITIONAL:
+        return ()
+    if param.kind == param.VAR_KEYWORD:
+        return {}
+    if param.default == param.empty:
+        return CantConvert(f"missing parameter: {param.name}")
+    return param.default
+
+
+def bind(func: Function,
+         values: t.Mapping[str, t.Any],
+         sig: t.Optional[inspect.Signature] = None,
+         ) -> t.Union[FunctionArgs, CantConvert]:
+    """Construct args and kwargs for function from values of parameters.
+
+    Values are used as-is (no conversion).
+    Missing values are replaced with the default value, and missing *args and
+    **kwargs are empty.
+    """
     args = []
     kwargs = {}
-    sig = inspect.signature(func)
+    if sig is None:
+        sig = inspect.signature(func)
+
+    unknown = set(values) - set(sig.parameters)
+    if unknown:
+        return CantConvert(f"unknown parameter: {min(unknown)}")
 
     for name, param in sig.parameters.items():
-        value = convert_value(param, custom_parsers[name], inputs[name])
+        value = values[name] if name in values else get_default(param)
         if isinstance(value, CantConvert):
             return value
 
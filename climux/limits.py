@@ -0,0 +1,206 @@
+"""Time and resource limits for commands."""
+
+import asyncio
+import functools
+import inspect
+import multiprocessing
+import pickle
+import signal
+import typing as t
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+
+Function = t.Callable[..., t.Any]
+
+# Exit statuses of commands that exceed their limits.
+EXIT_TIMEOUT = 124
+EXIT_MEMORY = 125
+EXIT_CPU = 128 + getattr(signal, "SIGXCPU", 24)
+
+
+class LimitExceeded(Exception):
+    """Command exceeded its time or resource limit."""
+    STATUS = {"timeout": EXIT_TIMEOUT, "memory": EXIT_MEMORY, "cpu": EXIT_CPU}
+    MESSAGE = {
+        "timeout": "command timed out after {} seconds",
+        "memory": "command exceeded memory limit of {} bytes",
+        "cpu": "command exceeded CPU time limit of {} seconds",
+    }
+
+    def __init__(self, kind: str, value: float):
+        super().__init__(self.MESSAGE[kind].format(value))
+        self.limit = kind
+        self.value = value
+
+    @property
+    def status(self) -> int:
+        """Exit status."""
+        return self.STATUS[self.limit]
+
+
+class CantPickle(TypeError):
+    """Function, arguments or result of command that runs in a worker
+    process can't be pickled."""
+
+
+def run_coroutine(result: t.Any, timeout: t.Optional[float] = None) -> t.Any:
+    """Run result to completion if it's a coroutine.
+
+    Cancels the coroutine and raises LimitExceeded on timeout.
+    """
+    if not inspect.iscoroutine(result):
+        return result
+    try:
+        return asyncio.run(asyncio.wait_for(result, timeout))
+    except asyncio.TimeoutError:
+        assert timeout is not None
+        raise LimitExceeded("timeout", timeout) from None
+
+
+def _worker(conn: t.Any,  # pylint: disable=too-many-arguments
+            function: Function,
+            args: t.Sequence[t.Any],
+            kwargs: t.Mapping[str, t.Any],
+            max_memory: t.Optional[int],
+            max_cpu: t.Optional[float]) -> None:
+    """Apply resource limits and send (status, result) to parent."""
+    try:
+        if resource is not None and max_memory is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+        if resource is not None and max_cpu is not None:
+            seconds = max(1, int(max_cpu + 0.999))
+            resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+        result = run_coroutine(function(*args, **kwargs))
+    except MemoryError:
+        conn.send(("memory", None))
+        return
+    except BaseException as exc:  # pylint: disable=broad-except
+        try:
+            conn.send(("error", exc))
+        except Exception:  # pylint: disable=broad-except
+            conn.send(("error", RuntimeError(repr(exc))))
+        return
+    try:
+        conn.send(("ok", result))
+    except Exception as exc:  # pylint: disable=broad-except
+        conn.send(("unpicklable", "can't pickle result of type "
+                   f"{type(result).__name__}: {exc}"))
+
+
+def start_worker(start_method: t.Optional[str],
+                 args: t.Tuple[t.Any, ...]) -> t.Tuple[t.Any, t.Any]:
+    """Start _worker process with args and return (receiver, process).
+
+    Raises CantPickle if the args can't be sent to the worker.
+    """
+    if start_method is None:
+        methods = multiprocessing.get_all_start_methods()
+        start_method = "forkserver" if "forkserver" in methods else "spawn"
+    context = multiprocessing.get_context(start_method)
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(  # type: ignore
+        target=_worker, args=(sender, *args), daemon=True,
+    )
+    try:
+        process.start()
+    except (AttributeError, TypeError, pickle.PicklingError) as exc:
+        receiver.close()
+        raise CantPickle(
+            f"can't pickle command function or arguments: {exc}"
+        ) from None
+    finally:
+        sender.close()
+    return receiver, process
+
+
+def call_in_worker(function: Function,  # pylint: disable=too-many-arguments
+                   args: t.Sequence[t.Any],
+                   kwargs: t.Mapping[str, t.Any],
+                   timeout: t.Optional[float] = None,
+                   max_memory: t.Optional[int] = None,
+                   max_cpu: t.Optional[float] = None,
+                   start_method: t.Optional[str] = None) -> t.Any:
+    """Call function in a worker process with time and resource limits.
+
+    The worker gets killed when it times out.
+    max_memory limits the address space (in bytes) and max_cpu limits CPU
+    time (in seconds, rounded up) of the worker.
+    start_method is the multiprocessing start method of the worker
+    ("forkserver" where available, or "spawn", by default). Workers start
+    with a fresh interpreter, so they don't inherit threads, locks, open
+    connections or other state of the caller, and changes they make to
+    such state are lost. The function must be importable (e.g. not defined
+    in an unguarded script), and it, its arguments, its result and its
+    exceptions must be picklable. Raises CantPickle otherwise.
+    "fork" starts workers faster and doesn't need importable functions,
+    but forked workers only get the calling thread, so locks held by other
+    threads (e.g. in logging) stay locked. Only opt into it in
+    single-threaded programs.
+    """
+    receiver, process = start_worker(
+        start_method, (function, args, kwargs, max_memory, max_cpu)
+    )
+    try:
+        if not receiver.poll(timeout):
+            assert timeout is not None
+            raise LimitExceeded("timeout", timeout)
+        status, result = receiver.recv()
+    except EOFError:
+        process.join()
+        if max_cpu is not None and process.exitcode in (
+            -getattr(signal, "SIGXCPU", 24),
+            -signal.SIGKILL,
+        ):
+            raise LimitExceeded("cpu", max_cpu) from None
+        raise RuntimeError(
+            f"command process exited with code {process.exitcode}"
+        ) from None
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+
+    if status == "memory":
+        assert max_memory is not None
+        raise LimitExceeded("memory", max_memory)
+    if status == "error":
+        raise result
+    if status == "unpicklable":
+        raise CantPickle(result)
+    return result
+
+
+def limit(function: Function,
+          timeout: t.Optional[float] = None,
+          max_memory: t.Optional[int] = None,
+          max_cpu: t.Optional[float] = None,
+          start_method: t.Optional[str] = None) -> Function:
+    """Wrap function so that it runs within limits.
+
+    Returns the function unchanged if there are no limits, so coroutine
+    functions still return coroutines (e.g. for callers in an event loop).
+    Otherwise, coroutine functions get run to completion. They get
+    cancelled on timeout if there are no resource limits. Other functions
+    run in a worker process (see call_in_worker).
+    """
+    if timeout is None and max_memory is None and max_cpu is None:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args: t.Any, **kwargs: t.Any) -> t.Any:
+        in_process = max_memory is None and max_cpu is None and (
+            timeout is None or inspect.iscoroutinefunction(function)
+        )
+        if in_process:
+            return run_coroutine(function(*args, **kwargs), timeout)
+        return call_in_worker(function, args, kwargs, timeout, max_memory,
+                              max_cpu, start_method)
+    return wrapper
+
+
+__all__ = ["CantPickle", "LimitExceeded", "limit"]
@@ -0,0 +1,128 @@
+"""Memory-mapped file parameters (memoryview, mmap.mmap, numpy.ndarray)."""
+
+import contextlib
+import importlib
+import math
+import mmap
+import os
+import typing as t
+
+from infer_parser import CantParse, Parser
+
+
+class MappedFile:  # pylint: disable=too-few-public-methods
+    """Path of file that gets memory-mapped when the command runs."""
+    __slots__ = ("path", "hint")
+
+    def __init__(self, path: str, hint: t.Any):
+        self.path = path
+        self.hint = hint
+
+    def __repr__(self) -> str:
+        return f"MappedFile({self.path!r}, {self.hint!r})"
+
+
+def is_ndarray(hint: t.Any) -> bool:
+    """Check if hint is numpy.ndarray (without importing numpy)."""
+    return getattr(hint, "__module__", None) == "numpy" and \
+        getattr(hint, "__name__", None) == "ndarray"
+
+
+def is_mapped_type(hint: t.Any) -> bool:
+    """Check if parameters of this type get memory-mapped files."""
+    return hint in (memoryview, mmap.mmap) or is_ndarray(hint)
+
+
+def make_mapped_parser(hint: t.Any) -> Parser:
+    """Make parser that validates file path for memory-mapped parameter."""
+    assert is_mapped_type(hint)
+
+    def function(tokens: t.Sequence[str]) -> MappedFile:
+        if len(tokens) != 1 or not os.path.isfile(tokens[0]):
+            raise CantParse(hint, tokens)
+        if hint is mmap.mmap and os.path.getsize(tokens[0]) == 0:
+            raise CantParse(hint, tokens)
+        return MappedFile(tokens[0], hint)
+    return Parser(hint, function, 1)
+
+
+def make_mapped_tuple_parser(hint: t.Any) -> Parser:
+    """Make parser for *args of memory-mapped parameters."""
+    parse = make_mapped_parser(hint)
+
+    def function(tokens: t.Sequence[str]) -> t.Tuple[MappedFile, ...]:
+        return tuple(parse([token]) for token in tokens)
+    return Parser(t.Tuple[hint, ...], function, "*")
+
+
+def release(resource: t.Any) -> None:
+    """Release memoryview or close mmap.
+
+    Does nothing if the function still exports pointers to it.
+    """
+    try:
+        if isinstance(resource, memoryview):
+            resource.release()
+        else:
+            resource.close()
+    except BufferError:
+        pass
+
+
+def open_file(mapped: MappedFile, stack: contextlib.ExitStack) -> t.Any:
+    """Memory-map file read-only.
+
+    The map gets released when the stack exits (see release).
+    ndarray parameters get arrays backed by the map (see as_ndarray).
+    """
+    with open(mapped.path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            view = memoryview(b"")
+        else:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            stack.callback(release, data)
+            if mapped.hint is mmap.mmap:
+                return data
+            view = memoryview(data)
+            stack.callback(release, view)
+        if is_ndarray(mapped.hint):
+            npy = mapped.path.endswith(".npy")
+            return as_ndarray(view, file if npy else None)
+        return view
+
+
+def as_ndarray(view: memoryview, npy: t.Optional[t.BinaryIO]) -> t.Any:
+    """Create read-only numpy array backed by view.
+
+    Arrays of .npy files get the dtype and shape in the header of the npy
+    file object. Other files become uint8 arrays.
+    The array holds a buffer of the view, so the map doesn't get released
+    while the array is still in use.
+    """
+    numpy = importlib.import_module("numpy")
+    if npy is None:
+        return numpy.frombuffer(view, dtype=numpy.uint8)
+    npy_format = importlib.import_module("numpy.lib.format")
+    if npy_format.read_magic(npy) == (1, 0):
+        header = npy_format.read_array_header_1_0(npy)
+    else:
+        header = npy_format.read_array_header_2_0(npy)
+    shape, fortran_order, dtype = header
+    array = numpy.frombuffer(view, dtype=dtype, count=math.prod(shape),
+                             offset=npy.tell())
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+def open_mapped(value: t.Any, stack: contextlib.ExitStack) -> t.Any:
+    """Replace MappedFile objects in value (or in a tuple or dict of values)
+    with memory-mapped files."""
+    if isinstance(value, MappedFile):
+        return open_file(value, stack)
+    if isinstance(value, tuple):
+        return tuple(open_mapped(item, stack) for item in value)
+    if isinstance(value, dict):
+        return {k: open_mapped(v, stack) for k, v in value.items()}
+    return value
+
+
+__all__ = ()
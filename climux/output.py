@@ -0,0 +1,171 @@
+"""Write command results."""
+
+import bz2
+import gzip
+import importlib
+import inspect
+import io
+import lzma
+import os
+from pathlib import Path
+import queue
+import signal
+import sys
+import threading
+import typing as t
+
+
+# Exit status of commands whose output pipe was closed (like SIGPIPE).
+EXIT_PIPE = 128 + getattr(signal, "SIGPIPE", 13)
+
+
+class OutputClosed(Exception):
+    """Output pipe was closed (e.g. by `head`) before the result was
+    written."""
+
+
+def silence_stdout() -> None:
+    """Redirect stdout to devnull.
+
+    Prevents another BrokenPipeError when Python flushes stdout at exit.
+    """
+    try:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        os.close(devnull)
+    except (OSError, ValueError):
+        pass
+
+
+def write_result(result: t.Any, file: t.Optional[t.TextIO] = None) -> None:
+    """Print result (to stdout by default).
+
+    Generators get printed item by item as they're produced. Other
+    iterators (e.g. files) get printed as-is.
+    Raises OutputClosed if the output pipe gets closed. Generators are
+    closed then, so they stop early and their finally blocks run.
+    """
+    if file is None:
+        file = sys.stdout
+    try:
+        if inspect.isgenerator(result):
+            for item in result:
+                print(item, file=file)
+        else:
+            print(result, file=file)
+        file.flush()
+    except BrokenPipeError:
+        if inspect.isgenerator(result):
+            result.close()
+        if file is sys.stdout:
+            silence_stdout()
+        raise OutputClosed from None
+
+
+# Size of chunks passed to the compression thread, and maximum number of
+# chunks waiting to be compressed.
+CHUNK_SIZE = 2**20
+QUEUE_SIZE = 8
+
+Opener = t.Callable[[str], t.BinaryIO]
+
+
+def open_zstd(path: str) -> t.BinaryIO:
+    """Open zstd-compressed file for writing.
+
+    Uses compression.zstd (Python 3.14+) or the zstandard package.
+    """
+    for name in ("compression.zstd", "zstandard"):
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            continue
+        return t.cast(t.BinaryIO, module.open(path, "wb"))
+    raise ValueError("zstd compression requires the zstandard package")
+
+
+OPENERS: t.Dict[str, Opener] = {
+    ".gz": lambda path: t.cast(t.BinaryIO, gzip.open(path, "wb", 6)),
+    ".bz2": lambda path: t.cast(t.BinaryIO, bz2.open(path, "wb")),
+    ".xz": lambda path: t.cast(t.BinaryIO, lzma.open(path, "wb")),
+    ".lzma": lambda path: t.cast(t.BinaryIO, lzma.open(path, "wb")),
+    ".zst": open_zstd,
+}
+
+
+class ThreadedWriter(io.RawIOBase):
+    """Write chunks to file in a background thread.
+
+    The queue of pending chunks is bounded, so writes block when the
+    thread falls behind.
+    Errors in the thread get raised by the next write or by close.
+    """
+    def __init__(self, file: t.BinaryIO, queue_size: int = QUEUE_SIZE):
+        self._closing = False
+        super().__init__()
+        self.file = file
+        self.queue: queue.Queue[t.Optional[bytes]] = queue.Queue(queue_size)
+        self.error: t.Optional[BaseException] = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: t.Any) -> int:
+        self._check()
+        self.queue.put(bytes(data))
+        return len(data)
+
+    def close(self) -> None:
+        """Wait for pending chunks to be written and close file."""
+        if self._closing:
+            return
+        self._closing = True
+        self.queue.put(None)
+        self.thread.join()
+        try:
+            self.file.close()
+        except Exception as exc:  # pylint: disable=broad-except
+            self.error = self.error or exc
+        super().close()
+        self._check()
+
+    def _check(self) -> None:
+        """Raise error from thread."""
+        if self.error is not None:
+            raise self.error
+
+    def _run(self) -> None:
+        """Write chunks until None.
+
+        Keeps taking chunks after an error so writers don't block.
+        """
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                return
+            if self.error is None:
+                try:
+                    self.file.write(chunk)
+                except Exception as exc:  # pylint: disable=broad-except
+                    self.error = exc
+
+
+def open_output(path: t.Union[str, Path]) -> t.TextIO:
+    """Open UTF-8 text file for writing.
+
+    Files with .gz, .bz2, .xz, .lzma or .zst suffixes get compressed in a
+    background thread, so compression overlaps with result generation.
+    """
+    opener = OPENERS.get(Path(path).suffix)
+    if opener is None:
+        return open(  # pylint: disable=consider-using-with
+            path, "w", encoding="utf-8",
+        )
+    raw = ThreadedWriter(opener(str(path)))
+    return io.TextIOWrapper(io.BufferedWriter(raw, CHUNK_SIZE),
+                            encoding="utf-8")
+
+
+__all__ = ()
@@ -0,0 +1,76 @@
+"""Parallel map with ordered results."""
+
+import collections
+import concurrent.futures
+import itertools
+import os
+import typing as t
+
+
+EXECUTORS: t.Dict[str, t.Callable[[int], concurrent.futures.Executor]] = {
+    "thread": concurrent.futures.ThreadPoolExecutor,
+    "process": concurrent.futures.ProcessPoolExecutor,
+}
+
+
+def chunked(items: t.Iterable[t.Any],
+            size: int) -> t.Iterator[t.Tuple[t.Any, ...]]:
+    """Split items into tuples of at most size items."""
+    iterator = iter(items)
+    while True:
+        chunk = tuple(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def map_ordered(  # pylint: disable=too-many-arguments
+        function: t.Callable[[t.Tuple[t.Any, ...]], t.Any],
+        items: t.Iterable[t.Any],
+        workers: t.Optional[int] = None,
+        executor: str = "thread",
+        window: t.Optional[int] = None,
+        chunksize: int = 1) -> t.Generator[t.Any, None, None]:
+    """Call function on chunks of items in parallel.
+
+    Yields results in the same order as the chunks. At most window calls
+    (2 * workers by default) are submitted or finished but not yet
+    consumed, so memory use is bounded even if items is huge.
+    The executor ("thread" or "process") starts when the first result is
+    requested, and shuts down when the iterator is exhausted or closed.
+    With the "process" executor, function and items must be picklable.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if window is None:
+        window = 2 * workers
+    if window < 1 or chunksize < 1:
+        raise ValueError("window and chunksize must be positive")
+    if executor not in EXECUTORS:
+        raise ValueError(f"unknown executor: {executor}")
+    return _map_ordered(function, chunked(items, chunksize),
+                        EXECUTORS[executor], workers, window)
+
+
+def _map_ordered(function: t.Callable[[t.Tuple[t.Any, ...]], t.Any],
+                 chunks: t.Iterable[t.Tuple[t.Any, ...]],
+                 executor: t.Callable[[int], concurrent.futures.Executor],
+                 workers: int,
+                 window: int) -> t.Generator[t.Any, None, None]:
+    """Implement map_ordered (after validating arguments)."""
+    pending: t.Deque[concurrent.futures.Future[t.Any]] = collections.deque()
+    pool = executor(workers)
+    try:
+        for chunk in chunks:
+            if len(pending) >= window:
+                yield pending.popleft().result()
+            pending.append(pool.submit(function, chunk))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+
+__all__ = ["map_ordered"]
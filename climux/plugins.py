@@ -0,0 +1,118 @@
+"""Cached discovery of commands from entry points."""
+
+import hashlib
+import importlib
+import json
+import os
+from pathlib import Path
+import sys
+import typing as t
+
+from .command import Command
+from .utils import get_cache_dir
+
+
+def fingerprint() -> str:
+    """Fingerprint installed distributions.
+
+    Installing or removing a distribution changes the modification time of
+    the sys.path directory it's installed in, so it's enough to hash sys.path
+    entries and their modification times.
+    """
+    digest = hashlib.sha256()
+    for entry in sys.path:
+        try:
+            mtime = os.stat(entry or ".").st_mtime_ns
+        except OSError:
+            mtime = -1
+        digest.update(f"{entry}\0{mtime}\0".encode())
+    return digest.hexdigest()
+
+
+def scan(group: str) -> t.Dict[str, str]:
+    """Scan installed distributions for entry points in group."""
+    from importlib import metadata  # pylint: disable=import-outside-toplevel
+    entry_points: t.Any = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        selected = entry_points.select(group=group)
+    else:
+        selected = entry_points.get(group, [])
+    return {entry.name: entry.value for entry in selected}
+
+
+def get_index_path(group: str) -> Path:
+    """Get path to entry point index of group."""
+    name = hashlib.sha256(group.encode()).hexdigest()[:16]
+    return get_cache_dir() / "entry-points" / f"{name}.json"
+
+
+def load_index(group: str) -> t.Dict[str, str]:
+    """Load entry points (name -> "module:attr") in group.
+
+    Rescans entry points and rewrites the index only if the fingerprint
+    changed.
+    """
+    path = get_index_path(group)
+    key = fingerprint()
+    try:
+        index = json.loads(path.read_text())
+        if index["group"] == group and index["fingerprint"] == key:
+            return dict(index["entry_points"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    entry_points = scan(group)
+    index = dict(group=group, fingerprint=key, entry_points=entry_points)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp.write_text(json.dumps(index))
+        os.replace(temp, path)
+    except OSError:
+        pass
+    return entry_points
+
+
+def load_object(target: str) -> t.Any:
+    """Import object from "module:attr" string."""
+    module_name, _, attrs = target.partition(":")
+    obj: t.Any = importlib.import_module(module_name.strip())
+    for attr in attrs.strip().split(".") if attrs.strip() else ():
+        obj = getattr(obj, attr)
+    return obj
+
+
+class LazyCommand:
+    """Command that gets imported and inspected only when it's needed.
+
+    The target is a function, a Command or a "module:attr" string that names
+    one.
+    """
+    __slots__ = ("name", "target")
+
+    def __init__(self,
+                 name: str,
+                 target: t.Union[str, Command, t.Callable[..., t.Any]]):
+        self.name = name
+        self.target = target
+
+    @property
+    def description(self) -> t.Optional[str]:
+        """Get command description without importing the command."""
+        if isinstance(self.target, str):
+            return None
+        if isinstance(self.target, Command):
+            return self.target.description
+        return self.target.__doc__
+
+    def load(self) -> Command:
+        """Import and create command."""
+        obj = self.target
+        if isinstance(obj, str):
+            obj = load_object(obj)
+        if isinstance(obj, Command):
+            return obj
+        return Command(obj, alias=self.name)
+
+
+__all__ = ["LazyCommand", "load_index"]
@@ -0,0 +1,146 @@
+"""Pools of shared resources (e.g. database connections)."""
+
+import contextlib
+import threading
+import typing as t
+
+
+class Pool:
+    """Pool of lazily created and reused instances of a resource.
+
+    Creates at most size instances. get blocks while every instance is in
+    use.
+    Instances get closed with close(instance), or with instance.close() if
+    close is None.
+    """
+    def __init__(self,
+                 factory: t.Callable[[], t.Any],
+                 size: int = 1,
+                 close: t.Optional[t.Callable[[t.Any], None]] = None):
+        if size < 1:
+            raise ValueError(f"invalid pool size: {size}")
+        self.factory = factory
+        self.size = size
+        self._close = close
+        self._idle: t.List[t.Any] = []
+        self._count = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def get(self) -> t.Any:
+        """Get idle instance, or create one if the pool isn't full.
+
+        Raises RuntimeError if the pool is closed.
+        """
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                self._condition.wait()
+        try:
+            return self.factory()
+        except BaseException:
+            with self._condition:
+                self._count -= 1
+                self._condition.notify()
+            raise
+
+    def put(self, instance: t.Any) -> None:
+        """Return instance to the pool (or close it if the pool is closed)."""
+        with self._condition:
+            if not self._closed:
+                self._idle.append(instance)
+                self._condition.notify()
+                return
+            self._count -= 1
+        self.dispose(instance)
+
+    @contextlib.contextmanager
+    def acquire(self) -> t.Iterator[t.Any]:
+        """Get instance and return it to the pool afterwards."""
+        instance = self.get()
+        try:
+            yield instance
+        finally:
+            self.put(instance)
+
+    def dispose(self, instance: t.Any) -> None:
+        """Close instance."""
+        if self._close is not None:
+            self._close(instance)
+        elif hasattr(instance, "close"):
+            instance.close()
+
+    def close(self) -> None:
+        """Close idle instances.
+
+        Instances that are in use get closed when they're returned.
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+            self._condition.notify_all()
+        for instance in idle:
+            self.dispose(instance)
+
+    @property
+    def closed(self) -> bool:
+        """Check if the pool is closed."""
+        return self._closed
+
+
+class Resources:
+    """Named pools of resources for commands with resource parameters."""
+    def __init__(self) -> None:
+        self.pools: t.Dict[str, Pool] = {}
+
+    def add(self,
+            name: str,
+            factory: t.Callable[[], t.Any],
+            size: int = 1,
+            close: t.Optional[t.Callable[[t.Any], None]] = None) -> None:
+        """Add pool of resources (see Pool)."""
+        self.pools[name] = Pool(factory, size, close)
+
+    def acquire(self,
+                params: t.Mapping[str, str],
+                stack: contextlib.ExitStack,
+                values: t.Optional[t.Mapping[str, t.Any]] = None,
+                held: t.Optional[t.Dict[str, t.Any]] = None,
+                ) -> t.Dict[str, t.Any]:
+        """Get resources of parameters that aren't in values.
+
+        params maps parameter names to resource names.
+        The resources get returned to their pools when the stack exits.
+        held maps resource names to instances that are already held on the
+        stack (e.g. by earlier commands in a pipeline). They get reused
+        instead of acquiring another instance, and new instances get added.
+        Raises KeyError on unknown resources.
+        """
+        if held is None:
+            held = {}
+        resources = {}
+        for param, name in params.items():
+            if values is not None and param in values:
+                continue
+            if name not in held:
+                if name not in self.pools:
+                    raise KeyError(f"unknown resource: {name}")
+                pool = self.pools[name]
+                held[name] = stack.enter_context(pool.acquire())
+            resources[param] = held[name]
+        return resources
+
+    def close(self) -> None:
+        """Close every pool."""
+        for pool in self.pools.values():
+            pool.close()
+
+
+__all__ = ["Pool", "Resources"]
@@ -0,0 +1,261 @@
+"""Dependency-aware parallel task runner."""
+
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+import contextvars
+import dataclasses
+import functools
+import glob
+import hashlib
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+import threading
+import typing as t
+
+from .cli import Cli
+from .command import Command
+
+
+Function = t.Callable[..., t.Any]
+
+_current_task: contextvars.ContextVar[t.Optional[str]] = \
+    contextvars.ContextVar("current_task", default=None)
+_output_lock = threading.Lock()
+
+
+class TaskFailed(Exception):
+    """Task or shell command failed.
+
+    returncode is the exit status of the failed command.
+    """
+    def __init__(self, message: str, returncode: int = 1):
+        super().__init__(message)
+        self.returncode = returncode
+
+
+def echo(line: str) -> None:
+    """Print line prefixed with the name of the current task."""
+    name = _current_task.get()
+    prefix = f"[{name}] " if name is not None else ""
+    with _output_lock:
+        sys.stdout.write(f"{prefix}{line.rstrip(chr(10))}\n")
+        sys.stdout.flush()
+
+
+def shell(cmd: str) -> None:
+    """Run shell command and stream its output with the task name prefix.
+
+    Raises TaskFailed if the command fails.
+    """
+    echo(f"$ {cmd}")
+    with subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, text=True) as proc:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            echo(line)
+    if proc.returncode != 0:
+        raise TaskFailed(f"{cmd} (exit status {proc.returncode})",
+                         proc.returncode)
+
+
+@dataclasses.dataclass
+class Task:
+    """Task with dependencies, and input and output files.
+
+    Inputs and outputs are glob patterns (relative to the current working
+    directory).
+    """
+    function: Function
+    deps: t.Sequence[str] = ()
+    inputs: t.Sequence[str] = ()
+    outputs: t.Sequence[str] = ()
+    alias: t.Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        """Get task name."""
+        if self.alias is not None:
+            return self.alias
+        return self.function.__name__
+
+    def digest(self) -> t.Optional[str]:
+        """Hash names and contents of input files.
+
+        Returns None if the task has no inputs (i.e. it always runs).
+        """
+        if not self.inputs:
+            return None
+        paths = sorted({
+            path
+            for pattern in self.inputs
+            for path in glob.glob(pattern, recursive=True)
+            if os.path.isfile(path)
+        })
+        digest = hashlib.sha256()
+        for path in paths:
+            digest.update(path.encode() + b"\0")
+            with open(path, "rb") as file:
+                for chunk in iter(functools.partial(file.read, 2**16), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def outputs_exist(self) -> bool:
+        """Check if every output pattern matches a file."""
+        return all(glob.glob(pattern, recursive=True)
+                   for pattern in self.outputs)
+
+
+class Runner:
+    """Run tasks and their dependencies concurrently.
+
+    Tasks whose input hashes are unchanged since their last successful run
+    (and whose outputs exist) get skipped. Hashes are stored in the state
+    file.
+    """
+    def __init__(self,
+                 workers: t.Optional[int] = None,
+                 state: Path = Path(".climux-tasks.json")):
+        self.workers = workers
+        self.state = state
+        self.tasks: t.Dict[str, Task] = {}
+        self._lock = threading.Lock()
+
+    def add(self, task: Task) -> None:
+        """Add task."""
+        self.tasks[task.name] = task
+
+    def plan(self, targets: t.Sequence[str]) -> t.List[str]:
+        """Get targets and their dependencies in topological order.
+
+        Raises KeyError on unknown tasks and ValueError on cycles.
+        """
+        order: t.List[str] = []
+        visiting: t.Set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"dependency cycle: {name}")
+            visiting.add(name)
+            for dep in self.tasks[name].deps:
+                visit(dep)
+            visiting.remove(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def load_state(self) -> t.Dict[str, str]:
+        """Load input hashes of successful runs."""
+        try:
+            return dict(json.loads(self.state.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            return {}
+
+    def save_digest(self, name: str, digest: str) -> None:
+        """Record input hash of successful run."""
+        with self._lock:
+            state = self.load_state()
+            state[name] = digest
+            self.state.write_text(json.dumps(state, indent=2),
+                                  encoding="utf-8")
+
+    def execute(self,
+                task: Task,
+                args: t.Sequence[t.Any] = (),
+                kwargs: t.Optional[t.Mapping[str, t.Any]] = None) -> t.Any:
+        """Run task unless it's up to date."""
+        token = _current_task.set(task.name)
+        try:
+            digest = task.digest()
+            if digest is not None and task.outputs_exist() and \
+                    self.load_state().get(task.name) == digest:
+                echo("up to date")
+                return None
+            result = task.function(*args, **(kwargs or {}))
+            if digest is not None:
+                self.save_digest(task.name, digest)
+            return result
+        finally:
+            _current_task.reset(token)
+
+    def run(self,
+            targets: t.Sequence[str],
+            args: t.Sequence[t.Any] = (),
+            kwargs: t.Optional[t.Mapping[str, t.Any]] = None) -> None:
+        """Run targets after their dependencies.
+
+        args and kwargs are passed to the targets only.
+        Independent tasks run concurrently. Raises the first exception if a
+        task fails, after waiting for running tasks to finish.
+        """
+        order = self.plan(targets)
+        waiting = {name: set(self.tasks[name].deps) for name in order}
+        running: t.Dict[Future[t.Any], str] = {}
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            error: t.Optional[BaseException] = None
+            while waiting or running:
+                for name in [n for n, deps in waiting.items() if not deps]:
+                    if error is not None:
+                        break
+                    del waiting[name]
+                    call_args = (args, kwargs) if name in targets else ((), {})
+                    future = executor.submit(self.execute, self.tasks[name],
+                                             *call_args)
+                    running[future] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                    for deps in waiting.values():
+                        deps.discard(name)
+            if error is not None:
+                raise error
+
+    def commands(self) -> t.Iterator[Command]:
+        """Create commands that run tasks with their dependencies."""
+        for name, task in self.tasks.items():
+            yield Command(self._make_target(name, task.function),
+                          alias=name, show_result=False)
+
+    def main(self,
+             prog: str,
+             description: t.Optional[str] = None,
+             args_: t.Optional[t.Sequence[str]] = None) -> None:
+        """Run command-line interface with a command per task.
+
+        Exits with the exit status of the failed command if a task raises
+        TaskFailed.
+        """
+        cli = Cli(prog, description=description)
+        for command in self.commands():
+            cli.add(command)
+        try:
+            cli.run(args_)
+        except TaskFailed as exc:
+            sys.stderr.write(f"{prog}: error: {exc}\n")
+            sys.exit(exc.returncode)
+
+    def _make_target(self, name: str, function: Function) -> Function:
+        """Wrap task function so that it runs with its dependencies."""
+        @functools.wraps(function)
+        def wrapper(*args: t.Any, **kwargs: t.Any) -> None:
+            self.run([name], args, kwargs)
+        return wrapper
+
+
+__all__ = ["Runner", "Task", "TaskFailed", "shell"]
@@ -0,0 +1,63 @@
+"""Prefix tree for resolving abbreviated subcommand names."""
+
+import typing as t
+
+
+class Node:  # pylint: disable=too-few-public-methods
+    """Trie node."""
+    __slots__ = ("children", "word", "count", "last")
+
+    def __init__(self) -> None:
+        self.children: t.Dict[str, Node] = {}
+        self.word: t.Optional[str] = None
+        self.count = 0
+        self.last: t.Optional[str] = None
+
+
+class Trie:
+    """Prefix tree of words.
+
+    Every node counts the words below it, so resolving a prefix takes time
+    proportional to the length of the prefix.
+    """
+    def __init__(self, words: t.Iterable[str] = ()):
+        self.root = Node()
+        for word in words:
+            self.insert(word)
+
+    def insert(self, word: str) -> None:
+        """Insert word into trie."""
+        if self.resolve(word) == word:
+            return
+        node = self.root
+        node.count += 1
+        node.last = word
+        for char in word:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = Node()
+            node = child
+            node.count += 1
+            node.last = word
+        node.word = word
+
+    def resolve(self, prefix: str) -> t.Optional[str]:
+        """Return word that matches prefix exactly or the only word that
+        starts with the prefix.
+
+        Returns None if there's no match or if the prefix is ambiguous.
+        """
+        node = self.root
+        for char in prefix:
+            child = node.children.get(char)
+            if child is None:
+                return None
+            node = child
+        if node.word is not None:
+            return node.word
+        if node.count == 1:
+            return node.last
+        return None
+
+
+__all__ = ["Trie"]
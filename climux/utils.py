@@ -1,6 +1,9 @@
 """Some utilities."""
 
+import contextlib
 import functools
+import os
+from pathlib import Path
 import typing as t
 
 from infer_parser import Parser
@@ -20,4 +23,47 @@ def make_simple_parser(func: t.Callable[[str], t.Any]) -> Parser:
     return Parser(func, wrapper, 1)
 
 
+def close_when_done(generator: t.Generator[t.Any, t.Any, t.Any],
+                    stack: contextlib.ExitStack,
+                    ) -> t.Generator[t.Any, t.Any, t.Any]:
+    """Wrap generator so that stack exits when it's exhausted or closed.
+
+    The stack also exits if the wrapper gets garbage-collected before it's
+    exhausted.
+    """
+    wrapper = _close_when_done(generator, stack)
+    next(wrapper)
+    return wrapper
+
+
+def _close_when_done(generator: t.Generator[t.Any, t.Any, t.Any],
+                     stack: contextlib.ExitStack,
+                     ) -> t.Generator[t.Any, t.Any, t.Any]:
+    """Implement close_when_done.
+
+    The first yield enters the stack, so that closing the wrapper before
+    it's started still exits the stack.
+    """
+    with stack:
+        try:
+            yield None
+            return (yield from generator)
+        finally:
+            generator.close()
+
+
+def get_cache_dir() -> Path:
+    """Get climux cache directory.
+
+    Uses $CLIMUX_CACHE_DIR if set, otherwise $XDG_CACHE_HOME/climux
+    (~/.cache/climux by default).
+    """
+    path = os.environ.get("CLIMUX_CACHE_DIR")
+    if path:
+        return Path(path)
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg) if xdg else Path.home() / ".cache"
+    return base / "climux"
+
+
 __all__ = ["make_simple_parser"]
@@ -0,0 +1,247 @@
+"""Rerun commands when their input files change."""
+
+import ctypes
+import ctypes.util
+import os
+from pathlib import Path
+import select
+import struct
+import sys
+import threading
+import time
+import traceback
+import typing as t
+
+
+# inotify event masks (see inotify(7)).
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_ISDIR = 0x40000000
+IN_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+    IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT = struct.Struct("iIII")
+
+
+def find_paths(value: t.Any) -> t.Set[Path]:
+    """Find paths in value (or in tuples, lists and dicts in value)."""
+    if isinstance(value, os.PathLike):
+        return {Path(os.fspath(value)).absolute()}
+    if isinstance(value, (tuple, list)):
+        return set().union(*map(find_paths, value))
+    if isinstance(value, dict):
+        return set().union(*map(find_paths, value.values()))
+    return set()
+
+
+class PollingWatcher:
+    """Detect changes by comparing modification times and sizes.
+
+    Directories are scanned recursively.
+    """
+    def __init__(self, paths: t.Iterable[Path], interval: float = 0.5):
+        self.paths = list(paths)
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self) -> t.Dict[str, t.Tuple[int, int]]:
+        """Get modification time and size of files."""
+        result: t.Dict[str, t.Tuple[int, int]] = {}
+        for path in self.paths:
+            for root, _, files in os.walk(path):
+                for name in files:
+                    stat_file(os.path.join(root, name), result)
+            stat_file(str(path), result)
+        return result
+
+    def wait(self, timeout: t.Optional[float] = None) -> bool:
+        """Wait until a file changes or until timeout.
+
+        Returns True if a file changed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self.scan()
+            if snapshot != self.snapshot:
+                self.snapshot = snapshot
+                return True
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return False
+            time.sleep(delay)
+
+    def close(self) -> None:
+        """Do nothing."""
+
+
+def stat_file(path: str, result: t.Dict[str, t.Tuple[int, int]]) -> None:
+    """Add modification time and size of file to result."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return
+    result[path] = (stat.st_mtime_ns, stat.st_size)
+
+
+class InotifyWatcher:
+    """Detect changes with inotify (Linux only).
+
+    Files are watched through their parent directories, so files that get
+    replaced (e.g. by editors) or created later are still watched.
+    Directories are watched recursively, like in PollingWatcher, including
+    subdirectories that get created later.
+    Raises OSError if inotify isn't available.
+    """
+    def __init__(self, paths: t.Iterable[Path]):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"),
+                                use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify not available")
+        self.descriptor = self.libc.inotify_init1(
+            os.O_NONBLOCK | os.O_CLOEXEC
+        )
+        if self.descriptor < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # Maps watch descriptor to names of relevant files in the directory
+        # (or None if every file is relevant).
+        self.watches: t.Dict[int, t.Optional[t.Set[str]]] = {}
+        # Maps watch descriptor of recursively watched directory to its path.
+        self.directories: t.Dict[int, Path] = {}
+        try:
+            for path in paths:
+                if path.is_dir():
+                    self.add_tree(path)
+                else:
+                    self.add(path.parent, path.name)
+        except OSError:
+            self.close()
+            raise
+
+    def add(self, directory: Path, name: t.Optional[str]) -> int:
+        """Watch directory for changes to file with name (or to any file).
+
+        Returns the watch descriptor.
+        """
+        watch_id = self.libc.inotify_add_watch(
+            self.descriptor, os.fsencode(directory), IN_MASK
+        )
+        if watch_id < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed",
+                          str(directory))
+        names = self.watches.get(watch_id, set())
+        if name is None or names is None:
+            self.watches[watch_id] = None
+        else:
+            self.watches[watch_id] = names | {name}
+        return t.cast(int, watch_id)
+
+    def add_tree(self, directory: Path) -> None:
+        """Watch every file in directory and in its subdirectories."""
+        for root, _, _ in os.walk(directory):
+            self.directories[self.add(Path(root), None)] = Path(root)
+
+    def read(self) -> bool:
+        """Read pending events and check if any are relevant."""
+        relevant = False
+        try:
+            data = os.read(self.descriptor, 65536)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset + EVENT.size <= len(data):
+            watch_id, mask, _, length = EVENT.unpack_from(data, offset)
+            start = offset + EVENT.size
+            name = os.fsdecode(data[start:start + length].rstrip(b"\0"))
+            offset = start + length
+            names = self.watches.get(watch_id, set())
+            if names is None or name in names:
+                relevant = True
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and \
+                    watch_id in self.directories:
+                self.add_new_tree(self.directories[watch_id] / name)
+        return relevant
+
+    def add_new_tree(self, directory: Path) -> None:
+        """Watch new subdirectory, unless it's already gone."""
+        try:
+            self.add_tree(directory)
+        except OSError:
+            pass
+
+    def wait(self, timeout: t.Optional[float] = None) -> bool:
+        """Wait until a file changes or until timeout.
+
+        Returns True if a file changed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.descriptor], [], [], remaining)
+            if ready and self.read():
+                return True
+            if not ready and remaining is not None:
+                return False
+
+    def close(self) -> None:
+        """Close inotify file descriptor."""
+        if self.descriptor >= 0:
+            os.close(self.descriptor)
+            self.descriptor = -1
+
+
+Watcher = t.Union[InotifyWatcher, PollingWatcher]
+
+
+def make_watcher(paths: t.Iterable[Path]) -> Watcher:
+    """Create inotify watcher, or polling watcher if inotify isn't
+    available."""
+    paths = list(paths)
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except OSError:
+            pass
+    return PollingWatcher(paths)
+
+
+def rerun_on_change(function: t.Callable[[], t.Any],
+                    paths: t.Iterable[Path],
+                    debounce: float = 0.1,
+                    stop: t.Optional[threading.Event] = None) -> None:
+    """Run function, and run it again whenever files in paths change.
+
+    Bursts of changes (e.g. saving many files) only rerun the function
+    once, after there are no changes for debounce seconds.
+    Errors raised by the function get printed, but don't stop watching.
+    Stops when stop is set or on KeyboardInterrupt.
+    """
+    if stop is None:
+        stop = threading.Event()
+    watcher = make_watcher(paths)
+    try:
+        while not stop.is_set():
+            try:
+                function()
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+            while not stop.is_set() and not watcher.wait(0.5):
+                pass
+            while watcher.wait(debounce):
+                pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+__all__ = ["rerun_on_change"]
@@ -0,0 +1,528 @@
+"""Run commands from a shared work queue.
+
+Jobs are command-line arguments of a Cli. Workers claim jobs, run them
+with Cli.dispatch and write back their exit statuses and output.
+Claimed jobs become visible to other workers again if they aren't
+completed within the visibility timeout, so every job runs at least once
+(and possibly more than once). Workers extend the visibility timeout of
+jobs while they run them. Queues with max_attempts abandon jobs that were
+claimed that many times without completing (e.g. because they crash their
+workers), and save them with status EXIT_ABANDONED.
+"""
+
+import abc
+import argparse
+import collections
+import contextlib
+import dataclasses
+import io
+import json
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+import traceback
+import typing as t
+import uuid
+
+from .args import arg, switch
+from .cli import Cli, UsageError
+from .command import Command
+from .limits import LimitExceeded
+from .output import write_result
+from .plugins import load_object
+
+
+# Exit status of jobs abandoned after max_attempts claims (dead letters).
+EXIT_ABANDONED = 123
+
+
+@dataclasses.dataclass
+class Job:
+    """Invocation request."""
+    id: str     # pylint: disable=invalid-name
+    argv: t.List[str]
+    attempts: int = 0
+
+
+@dataclasses.dataclass
+class Result:
+    """Exit status and output of job."""
+    status: int
+    output: str
+
+
+class Queue(abc.ABC):
+    """Queue of jobs with visibility timeouts."""
+    @abc.abstractmethod
+    def submit(self, argv: t.Sequence[str]) -> str:
+        """Add job and return its ID."""
+
+    @abc.abstractmethod
+    def claim(self) -> t.Optional[Job]:
+        """Claim the oldest visible job (or return None if there's none).
+
+        The job becomes invisible until its visibility timeout expires.
+        """
+
+    @abc.abstractmethod
+    def touch(self, job_id: str) -> bool:
+        """Restart visibility timeout of claimed job (heartbeat).
+
+        Returns False if the job is already done or abandoned.
+        """
+
+    @abc.abstractmethod
+    def complete(self, job_id: str, outcome: Result) -> None:
+        """Save result of job.
+
+        Only the first result counts if the job ran more than once.
+        """
+
+    @abc.abstractmethod
+    def result(self, job_id: str) -> t.Optional[Result]:
+        """Get result of job (or None if it isn't done yet)."""
+
+
+def abandoned(attempts: int) -> Result:
+    """Result of job abandoned after attempts claims."""
+    return Result(EXIT_ABANDONED,
+                  f"job abandoned after {attempts} attempts\n")
+
+
+class MemoryQueue(Queue):
+    """In-memory queue (e.g. for QueueServer)."""
+    def __init__(self,
+                 visibility: float = 30.0,
+                 max_attempts: t.Optional[int] = None):
+        self.visibility = visibility
+        self.max_attempts = max_attempts
+        # Maps ID of unfinished job to (job, visible_at).
+        self.pending: t.OrderedDict[str, t.Tuple[Job, float]] = \
+            collections.OrderedDict()
+        self.results: t.Dict[str, Result] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, argv: t.Sequence[str]) -> str:
+        job = Job(uuid.uuid4().hex, list(argv))
+        with self._lock:
+            self.pending[job.id] = (job, 0.0)
+        return job.id
+
+    def claim(self) -> t.Optional[Job]:
+        now = time.time()
+        with self._lock:
+            for job, visible_at in list(self.pending.values()):
+                if visible_at > now:
+                    continue
+                if self.max_attempts is not None and \
+                        job.attempts >= self.max_attempts:
+                    del self.pending[job.id]
+                    self.results[job.id] = abandoned(job.attempts)
+                    continue
+                job.attempts += 1
+                self.pending[job.id] = (job, now + self.visibility)
+                return dataclasses.replace(job, argv=list(job.argv))
+        return None
+
+    def touch(self, job_id: str) -> bool:
+        with self._lock:
+            if job_id not in self.pending:
+                return False
+            job, _ = self.pending[job_id]
+            self.pending[job_id] = (job, time.time() + self.visibility)
+            return True
+
+    def complete(self, job_id: str, outcome: Result) -> None:
+        with self._lock:
+            if job_id not in self.results:
+                self.pending.pop(job_id, None)
+                self.results[job_id] = outcome
+
+    def result(self, job_id: str) -> t.Optional[Result]:
+        with self._lock:
+            return self.results.get(job_id)
+
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    argv TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    visible_at REAL NOT NULL DEFAULT 0,
+    status INTEGER,
+    output TEXT
+);
+CREATE INDEX IF NOT EXISTS pending ON jobs (status, visible_at, seq);
+"""
+
+
+class SQLiteQueue(Queue):
+    """Queue in SQLite database file shared by workers on the same host or
+    on a shared filesystem that supports locking."""
+    def __init__(self,
+                 path: str,
+                 visibility: float = 30.0,
+                 max_attempts: t.Optional[int] = None):
+        self.path = path
+        self.visibility = visibility
+        self.max_attempts = max_attempts
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def connect(self) -> t.Iterator[sqlite3.Connection]:
+        """Open connection in autocommit mode."""
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, argv: t.Sequence[str]) -> str:
+        job_id = uuid.uuid4().hex
+        with self.connect() as conn:
+            conn.execute("INSERT INTO jobs (id, argv) VALUES (?, ?)",
+                         (job_id, json.dumps(list(argv))))
+        return job_id
+
+    def claim(self) -> t.Optional[Job]:
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if self.max_attempts is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, "
+                    "output = 'job abandoned after ' || attempts || "
+                    "' attempts' || char(10) "
+                    "WHERE status IS NULL AND visible_at <= ? "
+                    "AND attempts >= ?",
+                    (EXIT_ABANDONED, now, self.max_attempts),
+                )
+            row = conn.execute(
+                "SELECT id, argv, attempts FROM jobs "
+                "WHERE status IS NULL AND visible_at <= ? "
+                "ORDER BY seq LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET attempts = attempts + 1, visible_at = ? "
+                    "WHERE id = ?",
+                    (now + self.visibility, row[0]),
+                )
+            conn.execute("COMMIT")
+        if row is None:
+            return None
+        return Job(row[0], json.loads(row[1]), row[2] + 1)
+
+    def touch(self, job_id: str) -> bool:
+        with self.connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET visible_at = ? "
+                "WHERE id = ? AND status IS NULL",
+                (time.time() + self.visibility, job_id),
+            )
+            return cursor.rowcount > 0
+
+    def complete(self, job_id: str, outcome: Result) -> None:
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, output = ? "
+                "WHERE id = ? AND status IS NULL",
+                (outcome.status, outcome.output, job_id),
+            )
+
+    def result(self, job_id: str) -> t.Optional[Result]:
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT status, output FROM jobs "
+                "WHERE id = ? AND status IS NOT NULL",
+                (job_id,),
+            ).fetchone()
+        return Result(*row) if row is not None else None
+
+
+class QueueHandler(socketserver.StreamRequestHandler):
+    """Handle JSON requests (one per line) to the server's queue."""
+    server: "QueueServer"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                response = {"ok": self.server.call(json.loads(line))}
+            except Exception as exc:  # pylint: disable=broad-except
+                response = {"error": repr(exc)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class QueueServer(socketserver.ThreadingTCPServer):
+    """TCP server that shares a queue with remote workers (see TCPQueue).
+
+    The protocol is unauthenticated, so the server should only listen on
+    trusted networks (e.g. localhost).
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self,
+                 address: t.Tuple[str, int],
+                 queue: t.Optional[Queue] = None):
+        super().__init__(address, QueueHandler)
+        self.queue = queue if queue is not None else MemoryQueue()
+
+    def call(self, request: t.Mapping[str, t.Any]) -> t.Any:
+        """Run queue operation and return JSON-serializable response."""
+        operation = request["op"]
+        if operation == "submit":
+            return self.queue.submit(request["argv"])
+        if operation == "claim":
+            job = self.queue.claim()
+            return dataclasses.asdict(job) if job is not None else None
+        if operation == "touch":
+            return self.queue.touch(request["id"])
+        if operation == "complete":
+            self.queue.complete(request["id"], Result(**request["result"]))
+            return None
+        if operation == "result":
+            done = self.queue.result(request["id"])
+            return dataclasses.asdict(done) if done is not None else None
+        raise ValueError(f"unknown operation: {operation}")
+
+
+class TCPQueue(Queue):
+    """Client of QueueServer."""
+    def __init__(self, host: str, port: int, timeout: float = 60.0):
+        self.address = (host, port)
+        self.timeout = timeout
+
+    def request(self, **request: t.Any) -> t.Any:
+        """Send request to server and return its response.
+
+        Raises RuntimeError if the operation failed on the server.
+        """
+        with socket.create_connection(self.address, self.timeout) as sock:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as file:
+                response = json.loads(file.readline())
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["ok"]
+
+    def submit(self, argv: t.Sequence[str]) -> str:
+        return t.cast(str, self.request(op="submit", argv=list(argv)))
+
+    def claim(self) -> t.Optional[Job]:
+        job = self.request(op="claim")
+        return Job(**job) if job is not None else None
+
+    def touch(self, job_id: str) -> bool:
+        return bool(self.request(op="touch", id=job_id))
+
+    def complete(self, job_id: str, outcome: Result) -> None:
+        self.request(op="complete", id=job_id,
+                     result=dataclasses.asdict(outcome))
+
+    def result(self, job_id: str) -> t.Optional[Result]:
+        done = self.request(op="result", id=job_id)
+        return Result(**done) if done is not None else None
+
+
+def open_queue(url: str,
+               visibility: float = 30.0,
+               max_attempts: t.Optional[int] = None) -> Queue:
+    """Open queue from URL (sqlite:///path/to/jobs.db or tcp://host:port).
+
+    The visibility timeout and max_attempts of TCP queues are set by the
+    server.
+    """
+    scheme, _, rest = url.partition("://")
+    if scheme == "sqlite" and rest:
+        return SQLiteQueue(rest, visibility, max_attempts)
+    if scheme == "tcp":
+        host, _, port = rest.rpartition(":")
+        if host and port.isdigit():
+            return TCPQueue(host, int(port))
+    raise ValueError(f"invalid queue URL: {url}")
+
+
+class Worker:
+    """Run jobs from queue in a Cli, with slots jobs at a time.
+
+    Running jobs get their visibility timeout restarted every heartbeat
+    seconds, which should be well below the visibility timeout of the
+    queue. None disables heartbeats.
+    """
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 cli: Cli,
+                 queue: Queue,
+                 slots: int = 1,
+                 poll: float = 1.0,
+                 heartbeat: t.Optional[float] = 10.0):
+        self.cli = cli
+        self.queue = queue
+        self.slots = slots
+        self.poll = poll
+        self.heartbeat = heartbeat
+
+    def process(self, job: Job) -> Result:
+        """Run job and capture its result.
+
+        The output is the printed return value of the command, or the error
+        message. Output printed by the command itself isn't captured.
+        """
+        prog = self.cli.prog
+        try:
+            value = self.cli.dispatch(job.argv)
+            buffer = io.StringIO()
+            if value is not None:
+                write_result(value, buffer)
+            return Result(0, buffer.getvalue())
+        except UsageError as exc:
+            return Result(2, f"{exc.parser.prog}: error: {exc.args[0]}\n")
+        except LimitExceeded as exc:
+            return Result(exc.status, f"{prog}: error: {exc}\n")
+        except SystemExit as exc:
+            status = exc.code if isinstance(exc.code, int) else 1
+            return Result(status, "")
+        except Exception:  # pylint: disable=broad-except
+            return Result(1, traceback.format_exc())
+
+    @contextlib.contextmanager
+    def beat(self, job: Job) -> t.Iterator[None]:
+        """Touch job every heartbeat seconds in a thread until exit.
+
+        Stops early if the job is already done. Queue errors get printed.
+        """
+        if self.heartbeat is None:
+            yield
+            return
+        done = threading.Event()
+
+        def touch() -> None:
+            while not done.wait(self.heartbeat):
+                try:
+                    if not self.queue.touch(job.id):
+                        return
+                except Exception:  # pylint: disable=broad-except
+                    traceback.print_exc()
+
+        thread = threading.Thread(target=touch, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def loop(self, stop: threading.Event, drain: bool) -> None:
+        """Claim and run jobs until stop is set.
+
+        If drain is True, stops when there are no visible jobs.
+        Queue errors (e.g. lost connections to the server) get printed, and
+        the worker retries after poll seconds. Jobs whose results couldn't
+        be saved run again after their visibility timeout.
+        """
+        while not stop.is_set():
+            try:
+                job = self.queue.claim()
+                if job is None and drain:
+                    return
+                if job is not None:
+                    with self.beat(job):
+                        outcome = self.process(job)
+                    self.queue.complete(job.id, outcome)
+                    continue
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+            stop.wait(self.poll)
+
+    def run(self,
+            stop: t.Optional[threading.Event] = None,
+            drain: bool = False) -> None:
+        """Run jobs in slots threads until stop is set (see Worker.loop)."""
+        if stop is None:
+            stop = threading.Event()
+        threads = [
+            threading.Thread(target=self.loop, args=(stop, drain))
+            for _ in range(self.slots)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            stop.set()
+
+
+def serve(host: str = "127.0.0.1",
+          port: int = 8765,
+          visibility: float = 30.0,
+          max_attempts: t.Optional[int] = None) -> None:
+    """Run queue server."""
+    queue = MemoryQueue(visibility, max_attempts)
+    with QueueServer((host, port), queue) as server:
+        server.serve_forever()
+
+
+def work(target: str,  # pylint: disable=too-many-arguments
+         queue: str,
+         slots: int = 1,
+         visibility: float = 30.0,
+         max_attempts: t.Optional[int] = None,
+         heartbeat: float = 10.0,
+         drain: bool = False) -> None:
+    """Run jobs from queue in Cli object named by "module:attr" target."""
+    cli = load_object(target)
+    if not isinstance(cli, Cli):
+        raise TypeError(f"not a Cli object: {target}")
+    jobs = open_queue(queue, visibility, max_attempts)
+    Worker(cli, jobs, slots, heartbeat=heartbeat).run(drain=drain)
+
+
+def submit(queue: str, *argv: str) -> str:
+    """Submit job and print its ID.
+
+    Every argument after the queue belongs to the job, including options
+    (e.g. `submit sqlite:///jobs.db add --a 1 --b 2`).
+    """
+    return open_queue(queue).submit(argv)
+
+
+def result(queue: str, job_id: str) -> str:
+    """Print exit status and output of job."""
+    value = open_queue(queue).result(job_id)
+    if value is None:
+        return "pending"
+    return f"{value.status}\n{value.output}"
+
+
+__all__ = [
+    "Job",
+    "MemoryQueue",
+    "Queue",
+    "QueueServer",
+    "Result",
+    "SQLiteQueue",
+    "TCPQueue",
+    "Worker",
+    "open_queue",
+]
+
+
+if __name__ == "__main__":
+    main = Cli("python -m climux.worker", description=__doc__)
+    main.add(Command(serve, show_result=False))
+    main.add(Command(work, custom=dict(drain=switch("--drain")),
+                     show_result=False))
+    main.add(Command(submit, custom=dict(
+        queue=arg(),
+        argv=arg(nargs=argparse.REMAINDER,
+                 help="command-line arguments of the job"),
+    )))
+    main.add(Command(result, custom=dict(queue=arg(), job_id=arg())))
+    main.run()
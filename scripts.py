@@ -1,46 +1,54 @@
 #!/usr/bin/env python
-from climux import Cli, Command
-from subprocess import run
-import sys
+from climux.tasks import Runner, Task, shell
 
 
-def sh(cmd):
-    """Run command, exit if returncode is non-zero."""
-    print("$", cmd)
-    proc = run(cmd, shell=True)
-    if proc.returncode != 0:
-        print('> ', cmd, file=sys.stderr)
-        sys.exit(proc.returncode)
+SOURCES = ["climux/**/*.py", "tests/**/*.py"]
 
 
 def dist():
     """Make release."""
-    sh("python setup.py sdist bdist_wheel")
-    sh("twine upload dist/*")
+    shell("python setup.py sdist bdist_wheel")
+    shell("twine upload dist/*")
 
 
 def docker(version: str = "3.9"):
     """Run tests and linters in Docker container."""
     image = f"python:{version}-alpine"
-    sh(f"docker build -t test-climux --build-arg PYTHON_IMAGE={image} .")
-    sh("docker run test-climux")
+    shell(f"docker build -t test-climux --build-arg PYTHON_IMAGE={image} .")
+    shell("docker run test-climux")
+
+
+def mypy():
+    """Run mypy."""
+    shell("mypy -p climux -p tests --strict")
+
+
+def pylint():
+    """Run pylint."""
+    shell("pylint climux tests --fail-under=10")
+
+
+def flake8():
+    """Run flake8."""
+    shell("flake8 climux tests --max-complexity=10")
 
 
 def lint():
     """Run linters."""
-    sh("mypy -p climux -p tests --strict")
-    sh("pylint climux tests --fail-under=10")
-    sh("flake8 climux tests --max-complexity=10")
 
 
 def test():
     """Run tests."""
-    sh("pytest --cov=climux --cov=tests "
-       "--cov-report=term-missing --cov-fail-under=90 --cov-branch -x")
+    shell("pytest --cov=climux --cov=tests "
+          "--cov-report=term-missing --cov-fail-under=90 --cov-branch -x")
 
 
 if __name__ == "__main__":
-    cli = Cli("scripts.py", description="Dev scripts.")
-    for func in (dist, docker, lint, test):
-        cli.add(Command(func, show_result=False))
-    cli.run()
+    runner = Runner()
+    for func in (mypy, pylint, flake8):
+        runner.add(Task(func, inputs=SOURCES))
+    runner.add(Task(lint, deps=["mypy", "pylint", "flake8"]))
+    runner.add(Task(test, inputs=SOURCES))
+    runner.add(Task(docker))
+    runner.add(Task(dist, deps=["lint", "test"]))
+    runner.main("scripts.py", description="Dev scripts.")
@@ -24,6 +24,9 @@ setuptools.setup(
         "License :: OSI Approved :: MIT License",
         "Environment :: Console",
     ],
-    install_requires=["infer_parser==0.1.2"],
+    install_requires=[
+        "infer_parser==0.1.2",
+        'tomli>=1.1.0; python_version < "3.11"',
+    ],
     python_requires=">=3.7",
 )
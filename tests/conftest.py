@@ -1,4 +1,6 @@
 """Pytest fixtures."""
+from pathlib import Path
+
 import pytest
 from climux import Cli
 
@@ -7,3 +9,12 @@ from climux import Cli
 def cli() -> Cli:
     """Create Cli object."""
     return Cli("test", description="Test CLI app")
+
+
+@pytest.fixture(name="cache_dir", autouse=True)
+def fixture_cache_dir(tmp_path: Path,
+                      monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Use temporary cache directory."""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("CLIMUX_CACHE_DIR", str(path))
+    return path
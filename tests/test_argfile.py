@@ -0,0 +1,34 @@
+"""Test argfile.py."""
+
+from pathlib import Path
+
+from climux.argfile import expand_tokens, iter_tokens
+
+
+def test_iter_tokens_newline(tmp_path: Path) -> None:
+    """Tokens should be newline-delimited if there's no NUL byte."""
+    path = tmp_path / "args.txt"
+    path.write_text("foo\nbar baz\nqux\n")
+    assert list(iter_tokens(path)) == ["foo", "bar baz", "qux"]
+
+
+def test_iter_tokens_nul(tmp_path: Path) -> None:
+    """Tokens should be NUL-delimited if there's a NUL byte."""
+    path = tmp_path / "args.bin"
+    path.write_bytes(b"foo\nbar\0baz\0")
+    assert list(iter_tokens(path)) == ["foo\nbar", "baz"]
+
+
+def test_iter_tokens_empty(tmp_path: Path) -> None:
+    """Empty argument files should have no tokens."""
+    path = tmp_path / "empty"
+    path.touch()
+    assert not list(iter_tokens(path))
+
+
+def test_expand_tokens(tmp_path: Path) -> None:
+    """Only tokens with the prefix should be expanded."""
+    path = tmp_path / "args.txt"
+    path.write_text("b\nc")
+    tokens = ["a", f"@{path}", "d"]
+    assert list(expand_tokens(tokens, "@")) == ["a", "b", "c", "d"]
@@ -0,0 +1,52 @@
+"""Test bundle.py."""
+
+from pathlib import Path
+import subprocess
+import zipfile
+
+from climux.bundle import bundle
+
+
+SCRIPT = """\
+import sys
+import sysconfig
+from climux import Cli, Command
+
+def hello(name: str = "world") -> str:
+    return f"Hello, {name}! {sysconfig.get_paths()['purelib'] in sys.path}"
+
+cli = Cli("hello")
+cli.add(Command(hello))
+cli.run()
+"""
+
+
+def test_bundle(tmp_path: Path) -> None:
+    """Bundle should run without sources or site-packages."""
+    script = tmp_path / "hello.py"
+    script.write_text(SCRIPT)
+    app = bundle(script, tmp_path / "hello.pyz")
+
+    with zipfile.ZipFile(app) as archive:
+        names = archive.namelist()
+    assert "climux/cli.pyc" in names
+    assert "infer_parser/__init__.pyc" in names
+    assert "climux/py.typed" in names
+    assert not [n for n in names if n.endswith(".py") and n != "__main__.py"]
+
+    proc = subprocess.run([str(app), "hello", "--name", "bundle"],
+                          check=True, capture_output=True, text=True)
+    assert proc.stdout == "Hello, bundle! False\n"
+
+
+def test_bundle_sources(tmp_path: Path) -> None:
+    """Bundle should include sources if requested."""
+    script = tmp_path / "hello.py"
+    script.write_text(SCRIPT)
+    app = bundle(script, tmp_path / "hello.pyz", isolated=False, sources=True)
+    with zipfile.ZipFile(app) as archive:
+        assert "climux/cli.py" in archive.namelist()
+
+    proc = subprocess.run([str(app), "hello"],
+                          check=True, capture_output=True, text=True)
+    assert proc.stdout == "Hello, world! False\n"
@@ -0,0 +1,148 @@
+"""Test cache.py."""
+
+import os
+from pathlib import Path
+import time
+import typing as t
+
+from climux import Command, run
+from climux.cache import ParseCache, ResultCache
+
+
+def test_result_cache_call(tmp_path: Path) -> None:
+    """ResultCache.call should only call function on cache misses."""
+    calls = []
+
+    def func(arg: int) -> int:
+        calls.append(arg)
+        return arg * 2
+
+    cache = ResultCache(tmp_path)
+    assert cache.call(func, (1,), {}) == 2
+    assert cache.call(func, (1,), {}) == 2
+    assert cache.call(func, (2,), {}) == 4
+    assert calls == [1, 2]
+
+    assert cache.call(func, (1,), {}, refresh=True) == 2
+    assert calls == [1, 2, 1]
+
+
+def test_result_cache_function_changes(tmp_path: Path) -> None:
+    """Edited functions and functions made by factories shouldn't share
+    results."""
+    cache = ResultCache(tmp_path)
+
+    def func(arg: int) -> int:
+        return arg * 2
+
+    assert cache.call(func, (1,), {}) == 2
+
+    # pylint: disable=function-redefined
+    def func(arg: int) -> int:  # type: ignore # noqa: F811
+        return arg * 3
+
+    assert cache.call(func, (1,), {}) == 3
+
+    def make(factor: int) -> t.Callable[[int], int]:
+        def scale(arg: int) -> int:
+            return arg * factor
+        return scale
+
+    assert cache.call(make(2), (1,), {}) == 2
+    assert cache.call(make(5), (1,), {}) == 5
+    assert len(list(tmp_path.glob("*.pickle"))) == 4
+
+
+def test_result_cache_paths(tmp_path: Path) -> None:
+    """Changes to path arguments should invalidate results."""
+    def func(path: Path) -> str:
+        return path.read_text()
+
+    path = tmp_path / "input.txt"
+    path.write_text("foo")
+    cache = ResultCache(tmp_path / "cache")
+    assert cache.call(func, (path,), {}) == "foo"
+
+    path.write_text("foobar")
+    assert cache.call(func, (path,), {}) == "foobar"
+
+
+def test_result_cache_ttl(tmp_path: Path) -> None:
+    """Expired entries should be ignored."""
+    cache = ResultCache(tmp_path, ttl=60)
+    key = "key"
+    cache.put(key, "value")
+    assert cache.get(key) == (True, "value")
+
+    entry = tmp_path / f"{key}.pickle"
+    old = time.time() - 120
+    os.utime(entry, (old, old))
+    assert cache.get(key) == (False, None)
+    assert not entry.exists()
+
+
+def test_result_cache_ttl_of_used_entry(tmp_path: Path) -> None:
+    """Entries should expire even if they keep getting used."""
+    calls = []
+
+    def func() -> int:
+        calls.append(0)
+        return len(calls)
+
+    cache = ResultCache(tmp_path, ttl=0.3)
+    deadline = time.time() + 0.7
+    while time.time() < deadline:
+        cache.call(func, (), {})
+        time.sleep(0.05)
+    assert len(calls) >= 2
+
+
+def test_result_cache_max_size(tmp_path: Path) -> None:
+    """Least recently used entries should be evicted first."""
+    cache = ResultCache(tmp_path, max_size=300)
+    cache.put("a", "a" * 100)
+    time.sleep(0.01)
+    cache.put("b", "b" * 100)
+    time.sleep(0.01)
+    assert cache.get("a")[0]
+    time.sleep(0.01)
+    cache.put("c", "c" * 100)
+
+    assert cache.get("a")[0]
+    assert not cache.get("b")[0]
+    assert cache.get("c")[0]
+
+
+def test_command_cache(tmp_path: Path) -> None:
+    """Command should memoize results and add --no-cache option."""
+    calls: t.List[int] = []
+
+    def func(arg: int) -> int:
+        calls.append(arg)
+        return arg
+
+    command = Command(func, cache=ResultCache(tmp_path))
+    assert run(command, ["--arg", "1"]) == 1
+    assert run(command, ["--arg", "1"]) == 1
+    assert calls == [1]
+    assert run(command, ["--arg", "1", "--no-cache"]) == 1
+    assert calls == [1, 1]
+
+
+def test_parse_cache() -> None:
+    """ParseCache should evict least recently used entries and count hits."""
+    cache = ParseCache(max_size=2)
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert cache.hit_rate == 0.5
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get("c") is None
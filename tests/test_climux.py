@@ -1,13 +1,18 @@
 # pylint: disable=redefined-outer-name
 """Test climux."""
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import time
+import types
 import typing as t
 
 from pytest import CaptureFixture
 import pytest
 
-from climux import Cli, Command, run
-from climux.args import arg, opt, switch, toggle
+from climux import Cli, Command, ParseCache, UsageError, run
+from climux.args import arg, opt, resource, switch, toggle
+from climux.convert import CantConvert
 from climux.utils import make_simple_parser
 
 
@@ -242,6 +247,21 @@ def test__failed_option_parsing(cli: Cli, capsys: CaptureFixture[str]) -> None:
     assert "expected int" in err
 
 
+def test__failed_option_parsing_all_errors(
+        cli: Cli, capsys: CaptureFixture[str]) -> None:
+    """Program should report every invalid option at once with all_errors."""
+    def func(first: int, second: float) -> float:
+        return first + second
+
+    cli.add(Command(func, all_errors=True))
+    with pytest.raises(SystemExit):
+        cli.run(["func", "--first", "a", "--second", "b"])
+    _, err = capsys.readouterr()
+    assert "2 invalid arguments" in err
+    assert "expected int" in err
+    assert "expected float" in err
+
+
 def test__command_with_custom_parser(cli: Cli) -> None:
     """Options should be passed to the parser if there is one."""
     def func(arg_):  # type: ignore
@@ -377,3 +397,438 @@ def test__subcommand_description(cli: Cli,
     assert test.__name__ in out
     assert test.__doc__
     assert test.__doc__ in out
+
+
+def test__command_with_argfile(tmp_path: Path) -> None:
+    """Variadic parameters should accept argument files if enabled."""
+    def func(*args: int) -> int:
+        return sum(args)
+
+    path = tmp_path / "args"
+    path.write_text("\n".join(str(i) for i in range(101)))
+    command = Command(func, custom=dict(args=arg()), argfile_prefix="@")
+    assert run(command, ["1", f"@{path}", "2"]) == 5053
+
+
+def test_cli_nested_groups(cli: Cli, capsys: CaptureFixture[str]) -> None:
+    """Cli should dispatch to commands in nested groups."""
+    def migrate(version: int = 0) -> str:
+        return f"migrate {version}"
+
+    def backup() -> str:
+        return "backup"
+
+    db_cli = Cli("db", description="Database commands.")
+    db_cli.add(Command(migrate))
+    db_cli.add(Command(backup))
+    cli.add_group("db", db_cli)
+    cli.add(Command(backup, alias="dump"))
+
+    assert cli.run(["db", "migrate", "--version", "2"]) == "migrate 2"
+    assert cli.run(["db", "backup"]) == "backup"
+    assert cli.run(["db", "mi"]) == "migrate 0"
+    assert cli.run(["du"]) == "backup"
+
+    with pytest.raises(SystemExit):
+        cli.run(["db"])
+    _, err = capsys.readouterr()
+    assert "test db" in err
+    assert "required: subcommand" in err
+
+    with pytest.raises(SystemExit):
+        cli.run(["-h"])
+    out, _ = capsys.readouterr()
+    assert "Database commands." in out
+
+    with pytest.raises(SystemExit):
+        cli.run(["db", "migrate", "--version", "x"])
+    _, err = capsys.readouterr()
+    assert "test db migrate: error" in err
+
+
+def test_cli_nested_group_changes(cli: Cli) -> None:
+    """Cli should rebuild parsers of commands replaced in nested groups."""
+    def migrate() -> str:
+        return "migrate"
+
+    def migrate2(steps: int = 1) -> str:
+        return f"migrate {steps}"
+
+    db_cli = Cli("db")
+    db_cli.add(Command(migrate))
+    cli.add_group("db", db_cli)
+    assert cli.dispatch(["db", "migrate"]) == "migrate"
+
+    db_cli.add(Command(migrate2, alias="migrate"))
+    assert cli.dispatch(["db", "migrate", "--steps", "2"]) == "migrate 2"
+    assert cli.dispatch(["db", "migrate"]) == "migrate 1"
+
+
+def test_cli_lazy_group(cli: Cli) -> None:
+    """Lazy groups should be imported only when used."""
+    cli.add_group("nested", f"{__name__}:NESTED")
+    cli.add(Command(lambda: "top", alias="top"))
+    assert cli.run(["top"]) == "top"
+    assert isinstance(cli.groups["nested"], str)
+    assert cli.run(["nested", "hello"]) == "Hello."
+    assert cli.load_group("nested") is NESTED
+
+    cli.add_group("invalid", f"{__name__}:test_cli_lazy_group")
+    with pytest.raises(TypeError):
+        cli.run(["invalid"])
+
+
+NESTED = Cli("nested")
+NESTED.add(Command(lambda: "Hello.", alias="hello"))
+
+
+def test_cli_dispatch_errors(cli: Cli) -> None:
+    """Cli.dispatch should raise UsageError instead of exiting."""
+    def func(arg_: int) -> int:
+        return arg_
+
+    cli.add(Command(func))
+    assert cli.dispatch(["func", "--arg_", "1"]) == 1
+
+    with pytest.raises(UsageError) as exc_info:
+        cli.dispatch(["func", "--arg_", "a"])
+    assert "expected int" in exc_info.value.args[0]
+
+    with pytest.raises(UsageError) as exc_info:
+        cli.dispatch(["func"])
+    assert "required" in exc_info.value.args[0]
+
+    with pytest.raises(UsageError) as exc_info:
+        cli.dispatch(["invalid"])
+    assert "invalid choice" in exc_info.value.args[0]
+
+
+def test_cli_dispatch_threads(cli: Cli) -> None:
+    """Concurrent dispatches should not interfere with each other."""
+    def add(left: int, right: int) -> int:
+        return left + right
+
+    def wait(seconds: float) -> float:
+        time.sleep(seconds)
+        return seconds
+
+    cli.add(Command(add))
+    cli.add(Command(wait))
+
+    def task(i: int) -> int:
+        args = ["add", "--left", str(i), "--right", str(i)]
+        return t.cast(int, cli.dispatch(args))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(task, range(1000))) == [
+            2 * i for i in range(1000)
+        ]
+
+    # Commands that release the GIL should run concurrently.
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(lambda _: cli.dispatch(["wait", "--seconds", "0.1"]),
+                          range(16)))
+    assert time.perf_counter() - start < 0.8
+
+
+def test_cli_call(cli: Cli) -> None:
+    """Cli.call should pass values to the function without parsing."""
+    # pylint: disable=invalid-name,keyword-arg-before-vararg
+    def func(a: int, /, b: int = 2, *c: int, d: int, **e: int) -> t.Any:
+        return a, b, c, d, e
+
+    group = Cli("group")
+    group.add(Command(func))
+    cli.add_group("group", group)
+
+    assert cli.call("group func", a=1, d=4) == (1, 2, (), 4, {})
+    assert cli.call("group func", a=1, b=0, c=[5, 6], d=4, e=dict(x=7)) == (
+        1, 0, (5, 6), 4, {"x": 7}
+    )
+
+    with pytest.raises(CantConvert) as exc_info:
+        cli.call("group func", a=1)
+    assert "missing parameter: d" in exc_info.value.args[0]
+
+    with pytest.raises(CantConvert) as exc_info:
+        cli.call("group func", a=1, d=4, f=5)
+    assert "unknown parameter: f" in exc_info.value.args[0]
+
+    with pytest.raises(KeyError):
+        cli.call("group invalid")
+    with pytest.raises(KeyError):
+        cli.call("")
+
+
+def test_command_call_tokens() -> None:
+    """Command.call_tokens should parse tokens without argparse."""
+    def func(a: int, *b: float, c: str = "c") -> t.Any:  # pylint: disable=C0103; # noqa: E501
+        return a, b, c
+
+    command = Command(func)
+    assert command.call_tokens(dict(a=["1"])) == (1, (), "c")
+    assert command.call_tokens(dict(a=["1"], b=["2", "3"], c=["x"])) == (
+        1, (2.0, 3.0), "x"
+    )
+
+    with pytest.raises(CantConvert) as exc_info:
+        command.call_tokens(dict(a=["x"]))
+    assert "expected int" in exc_info.value.args[0]
+
+    with pytest.raises(CantConvert) as exc_info:
+        command.call_tokens(dict(a=["1"], d=["1"]))
+    assert "unknown parameter: d" in exc_info.value.args[0]
+
+
+def test_cli_from_module() -> None:
+    """Cli.from_module should lazily add public functions in module."""
+    module = types.ModuleType("api", "API wrappers.")
+    exec(  # pylint: disable=exec-used
+        "from os.path import join\n"
+        "def get(key: int) -> int:\n"
+        "    '''Get value.'''\n"
+        "    return key\n"
+        "def put(key: int) -> None:\n"
+        "    pass\n"
+        "def _private() -> None:\n"
+        "    pass\n",
+        vars(module),
+    )
+
+    cli = Cli.from_module(module)
+    assert cli.prog == "api"
+    assert cli.description == "API wrappers."
+    assert set(cli.lazy) == {"get", "put"}
+    assert not cli.commands
+    assert cli.run(["get", "--key", "5"]) == 5
+    assert set(cli.commands) == {"get"}
+
+    cli = Cli.from_module(module, predicate=lambda f: f.__doc__ is not None)
+    assert set(cli.lazy) == {"get"}
+
+
+def test_cli_from_object() -> None:
+    """Cli.from_object should lazily add public methods of object."""
+    class Api:
+        """API wrapper."""
+        def __init__(self) -> None:
+            self.prefix = "foo"
+
+        def get(self, key: str) -> str:
+            """Get value."""
+            return self.prefix + key
+
+        @staticmethod
+        def static() -> str:
+            """Static method."""
+            return "static"
+
+        @property
+        def prop(self) -> str:
+            """Properties should be ignored."""
+            raise AssertionError
+
+        def _private(self) -> None:
+            """Private methods should be ignored."""
+
+    cli = Cli.from_object(Api())
+    assert cli.prog == "api"
+    assert set(cli.lazy) == {"get", "static"}
+    assert cli.run(["get", "--key", "bar"]) == "foobar"
+    assert cli.run(["static"]) == "static"
+
+
+def test_cli_pipeline(cli: Cli, capsys: CaptureFixture[str]) -> None:
+    """Results should be passed between commands without serialization."""
+    consumed = []
+
+    def numbers(count: int) -> t.Iterator[int]:
+        for i in range(count):
+            consumed.append(i)
+            yield i
+
+    def double(items: t.Iterable[int]) -> t.Iterator[int]:
+        return (2 * item for item in items)
+
+    def total(items: t.Iterable[int], start: int = 0) -> int:
+        return sum(items, start)
+
+    parser = make_simple_parser(lambda s: [int(s)])
+    cli.add(Command(numbers))
+    cli.add(Command(double, custom=dict(items=opt(parser=parser)),
+                    pipe="items"))
+    cli.add(Command(total, custom=dict(items=opt(parser=parser)),
+                    pipe="items"))
+
+    result = cli.dispatch(["numbers", "--count", "4", ":::", "double"])
+    assert not consumed
+    assert list(result) == [0, 2, 4, 6]
+
+    args = "numbers --count 4 ::: double ::: total --start 1".split()
+    assert cli.run(args) == 13
+    out, _ = capsys.readouterr()
+    assert out == "13\n"
+
+    assert cli.run(["total", "--items", "5"]) == 5
+
+    with pytest.raises(UsageError) as exc_info:
+        cli.dispatch("total --items 5 ::: numbers --count 1".split())
+    assert "doesn't accept piped input" in exc_info.value.args[0]
+
+    with pytest.raises(UsageError) as exc_info:
+        cli.dispatch(["total"])
+    assert "missing parameter: items" in exc_info.value.args[0]
+
+    def echo(*words: str) -> str:
+        return " ".join(words)
+
+    cli.add(Command(echo, custom=dict(words=arg())))
+    assert cli.dispatch(["echo", "--", "a", ":::", "b"]) == "a ::: b"
+
+
+def test_cli_pipeline_positional(cli: Cli) -> None:
+    """Positional pipe parameters should be optional in later stages."""
+    def upper(text: str) -> str:
+        return text.upper()
+
+    def suffix(text: str, end: str = "!") -> str:
+        return text + end
+
+    cli.add(Command(upper, custom=dict(text=arg())))
+    cli.add(Command(suffix, custom=dict(text=arg()), pipe="text"))
+    assert cli.dispatch(["upper", "a", ":::", "suffix"]) == "A!"
+    assert cli.dispatch("upper a ::: suffix --end ?".split()) == "A?"
+    assert cli.dispatch(["suffix", "b"]) == "b!"
+
+    with pytest.raises(UsageError) as exc_info:
+        cli.dispatch(["suffix"])
+    assert "missing parameter: text" in exc_info.value.args[0]
+
+
+def test_cli_resources(cli: Cli) -> None:
+    """Commands should get pooled resources that are reused across runs."""
+    opened: t.List[t.List[str]] = []
+
+    def connect() -> t.List[str]:
+        opened.append([])
+        return opened[-1]
+
+    def insert(value: str, database: t.Any = None) -> int:
+        database.append(value)
+        return len(database)
+
+    def count(conn: t.List[str]) -> int:
+        return len(conn)
+
+    with cli:
+        cli.add_resource("db", connect,
+                         close=lambda conn: conn.append("closed"))
+        cli.add(Command(insert, custom=dict(database=resource("db"))))
+        cli.add(Command(count, custom=dict(conn=resource("db"))))
+
+        assert cli.dispatch(["insert", "--value", "a"]) == 1
+        assert cli.dispatch(["insert", "--value", "b"]) == 2
+        assert cli.call("insert", value="c") == 3
+        assert cli.call("count") == 3
+        assert cli.call("count", conn=[]) == 0
+        assert len(opened) == 1
+
+        with pytest.raises(UsageError):
+            cli.dispatch(["insert", "--value", "d", "--database", "x"])
+        cli.build().parse_args(["insert", "--value", "a"])
+    assert opened == [["a", "b", "c", "closed"]]
+
+    command = cli.get("count")
+    with pytest.raises(CantConvert) as exc_info:
+        command.call_tokens({})
+    assert "missing resource: conn" in exc_info.value.args[0]
+    assert command.call_tokens({}, dict(conn=["x"])) == 1
+
+    def rows(count: int, database: t.Any = None) -> t.Iterator[str]:
+        for i in range(count):
+            yield f"{database[-1]} {i}"
+
+    connections: t.List[t.List[str]] = []
+
+    def open_db() -> t.List[str]:
+        connections.append(["open"])
+        return connections[-1]
+
+    with cli:
+        cli.add_resource("db", open_db, size=2,
+                         close=lambda conn: conn.append("closed"))
+        cli.add(Command(rows, custom=dict(database=resource("db"))))
+        result = cli.dispatch(["rows", "--count", "2"])
+        called = cli.call("rows", count=1)
+    assert list(called) == ["open 0"]
+    assert list(result) == ["open 0", "open 1"]
+    assert all(conn[-1] == "closed" for conn in connections)
+
+    def tag(value: str, conn: t.Any = None) -> str:
+        return f"{value}{len(conn)}"
+
+    with Cli("shared") as shared:
+        shared.add_resource("conn", list)
+        shared.add(Command(tag, custom=dict(conn=resource()), pipe="value"))
+        assert shared.dispatch(["tag", "--value", "a", ":::", "tag"]) == \
+            "a00"
+
+    unknown = Cli("unknown")
+    unknown.add(Command(count, custom=dict(conn=resource())))
+    with pytest.raises(KeyError):
+        unknown.dispatch(["count"])
+
+
+def test_cli_parse_cache(capsys: CaptureFixture[str],
+                         monkeypatch: pytest.MonkeyPatch) -> None:
+    """Repeated invocations of deterministic commands should skip parsing."""
+    def double(value: int) -> int:
+        return value * 2
+
+    def now() -> float:
+        return time.time()
+
+    cli = Cli("test", parse_cache=ParseCache())
+    cli.add(Command(double, deterministic=True))
+    cli.add(Command(now))
+    group = Cli("group")
+    group.add(Command(double, deterministic=True))
+    cli.add_group("group", group)
+
+    parsed = []
+    parse = cli.parse
+
+    def count_parse(args_: t.Sequence[str]) -> t.Any:
+        parsed.append(list(args_))
+        return parse(args_)
+
+    monkeypatch.setattr(cli, "parse", count_parse)
+    assert cli.dispatch(["double", "--value", "2"]) == 4
+    assert cli.dispatch(["double", "--value", "2"]) == 4
+    assert cli.dispatch(["double", "--value", "3"]) == 6
+    assert cli.dispatch(["now"]) != cli.dispatch(["now"])
+    assert len(parsed) == 4
+    cache = cli.parse_cache
+    assert cache is not None and len(cache) == 2
+    assert cache.hits == 1 and cache.misses == 2
+
+    assert cli.dispatch(["group", "double", "--value", "2"]) == 4
+    assert cli.dispatch(["group", "double", "--value", "2"]) == 4
+    assert len(parsed) == 5
+    group.add(Command(now, alias="double"))
+    assert cli.dispatch(["group", "double"]) > 0
+    assert cli.dispatch(["double", "--value", "2"]) == 4
+    assert len(parsed) == 7
+
+    with pytest.raises(UsageError):
+        cli.dispatch(["double", "--value", "x"])
+    cli.add(Command(double))
+    assert len(cache) == 0
+
+    cache = ParseCache()
+    command = Command(double, deterministic=True)
+    assert run(command, ["--value", "4"], parse_cache=cache) == 8
+    assert run(command, ["--value", "4"], parse_cache=cache) == 8
+    assert cache.hits == 1
+    assert capsys.readouterr().out == "8\n8\n"
@@ -0,0 +1,53 @@
+"""Test compiler.py."""
+
+import typing as t
+
+from infer_parser import UnsupportedType, make_parser
+import pytest
+
+from climux.compiler import compile_parser
+
+
+CASES: t.List[t.Tuple[t.Any, t.List[t.List[str]]]] = [
+    (t.List[int], [[], ["1", "2", "3"], ["1", "x"], [""]]),
+    (t.List[bool], [["t", "no"], ["maybe"]]),
+    (t.List[t.Tuple[str, int]], [["a", "1", "b", "2"], ["a", "1", "b"]]),
+    (t.Tuple[float, ...], [[], ["1.5", "2"], ["1", "y"]]),
+    (t.Tuple[t.Tuple[int, float], ...], [["1", "2", "3", "4"], ["1"]]),
+    (t.Dict[str, t.Tuple[float, float]],
+     [["a", "1", "2", "b", "3", "4"], ["a", "1"], ["a", "1", "x"]]),
+    (t.Dict[t.Tuple[int, str], t.Union[int, float]],
+     [["1", "a", "2", "2", "b", "2.5"], ["1", "a", "x"]]),
+    (t.Tuple[int, t.Tuple[str, bool]],
+     [["1", "a", "yes"], ["1", "a"], ["1", "a", "yes", "no"]]),
+    (t.Dict[int, None], [["1", "none", "2", ""], ["1", "x"]]),
+]
+
+
+@pytest.mark.parametrize("hint,inputs", CASES)
+def test_compile_parser_matches_make_parser(
+    hint: t.Any,
+    inputs: t.List[t.List[str]],
+) -> None:
+    """Compiled parsers should behave like infer_parser parsers."""
+    compiled = compile_parser(hint)
+    parser = make_parser(hint)
+    assert compiled.function is not parser.function
+    assert compiled.length == parser.length
+    for tokens in inputs:
+        try:
+            expected = parser(tokens)
+        except ValueError:
+            with pytest.raises(ValueError):
+                compiled(tokens)
+        else:
+            assert compiled(tokens) == expected
+
+
+def test_compile_parser_fallback() -> None:
+    """Types that can't be compiled should get infer_parser parsers."""
+    assert compile_parser(int) is make_parser(int)
+    assert compile_parser(t.Optional[int])([]) is None
+    assert compile_parser(t.Tuple[int, t.List[int]])(["1", "2"]) == (1, [2])
+    with pytest.raises(UnsupportedType):
+        compile_parser(t.List[t.List[int]])
@@ -0,0 +1,141 @@
+"""Test config.py."""
+
+from pathlib import Path
+import typing as t
+
+import pytest
+
+from climux import Cli, Command, Config, ConfigError, UsageError, run
+from climux.args import arg, switch
+
+
+def test_config_toml(tmp_path: Path) -> None:
+    """TOML tables should become sections."""
+    path = tmp_path / "tool.toml"
+    path.write_text(
+        'verbose = true\n'
+        '[db.migrate]\n'
+        'version = 3\n'
+        'tables = ["a", "b"]\n'
+    )
+    config = Config(path)
+    assert config.lookup("db.migrate", "version") == ["3"]
+    assert config.lookup("db.migrate", "tables") == ["a", "b"]
+    assert config.lookup("db.migrate", "verbose") == ["true"]
+    assert config.lookup("db.backup", "version") is None
+
+
+def test_config_ini(tmp_path: Path) -> None:
+    """INI values should be split like shell arguments."""
+    path = tmp_path / "tool.ini"
+    path.write_text(
+        "[DEFAULT]\nverbose = 1\n"
+        "[greet]\nname = 'John Doe'\nnumbers = 1 2 3\n"
+    )
+    config = Config(path)
+    assert config.lookup("greet", "name") == ["John Doe"]
+    assert config.lookup("greet", "numbers") == ["1", "2", "3"]
+    assert config.lookup("greet", "verbose") == ["1"]
+    assert config.lookup("other", "verbose") == ["1"]
+
+
+def test_config_env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Environment variables should override config file."""
+    path = tmp_path / "tool.ini"
+    path.write_text("[db.migrate]\nversion = 1\n")
+    monkeypatch.setenv("TOOL_DB_MIGRATE_VERSION", "2")
+    assert Config(path, env_prefix="tool").lookup("db.migrate",
+                                                  "version") == ["2"]
+    assert Config(path).lookup("db.migrate", "version") == ["1"]
+
+
+def test_config_cache(tmp_path: Path, cache_dir: Path,
+                      monkeypatch: pytest.MonkeyPatch) -> None:
+    """Parsed config should be cached until the file changes."""
+    path = tmp_path / "tool.ini"
+    path.write_text("[greet]\nname = foo\n")
+    assert Config(path).lookup("greet", "name") == ["foo"]
+    assert list(cache_dir.glob("config/*.json"))
+
+    with monkeypatch.context() as patch:
+        def fail(_: Config) -> None:
+            raise AssertionError
+
+        patch.setattr(Config, "parse", fail)
+        assert Config(path).lookup("greet", "name") == ["foo"]
+
+    path.write_text("[greet]\nname = foobar\n")
+    assert Config(path).lookup("greet", "name") == ["foobar"]
+
+
+def test_config_missing_file(tmp_path: Path) -> None:
+    """Missing config file should be empty."""
+    assert Config(tmp_path / "missing.toml").lookup("foo", "bar") is None
+
+
+@pytest.mark.parametrize("name, text", [
+    ("tool.toml", "[greet\nname = 1\n"),
+    ("tool.ini", "name = 1\n"),
+])
+def test_invalid_config(tmp_path: Path, name: str, text: str,
+                        capsys: pytest.CaptureFixture[str]) -> None:
+    """Invalid config files should be reported as usage errors."""
+    def greet(name: str = "world") -> str:
+        return f"Hello, {name}!"
+
+    path = tmp_path / name
+    path.write_text(text)
+    config = Config(path)
+    for _ in range(2):
+        with pytest.raises(ConfigError):
+            config.lookup("greet", "name")
+
+    with pytest.raises(SystemExit) as exc_info:
+        run(Command(greet), [], config=Config(path))
+    assert exc_info.value.code == 2
+    _, err = capsys.readouterr()
+    assert f"greet: error: {path}: " in err
+
+    cli = Cli("tool", config=config)
+    cli.add(Command(greet))
+    for _ in range(2):
+        with pytest.raises(UsageError):
+            cli.dispatch(["greet"])
+
+
+def test_cli_config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Config defaults should be layered under command-line arguments."""
+    def migrate(pos: int, version: int, *tables: str, dry_run: bool
+                ) -> t.Tuple[int, int, t.Tuple[str, ...], bool]:
+        return pos, version, tables, dry_run
+
+    path = tmp_path / "tool.toml"
+    path.write_text(
+        "[db.migrate]\nversion = 3\ntables = ['a', 'b']\ndry_run = true\n"
+        "pos = 5\n"
+    )
+    group = Cli("db")
+    group.add(Command(migrate, custom=dict(pos=arg(), dry_run=switch())))
+    cli = Cli("tool", config=Config(path, env_prefix="tool"))
+    cli.add_group("db", group)
+
+    assert cli.run(["db", "migrate", "0"]) == (0, 3, ("a", "b"), True)
+    assert cli.run(["db", "migrate", "0", "--version", "4"]) == (
+        0, 4, ("a", "b"), True
+    )
+
+    monkeypatch.setenv("TOOL_DB_MIGRATE_VERSION", "x")
+    cli = Cli("tool", config=Config(path, env_prefix="tool"))
+    cli.add_group("db", group)
+    with pytest.raises(SystemExit):
+        cli.run(["db", "migrate", "0"])
+
+
+def test_run_config(tmp_path: Path) -> None:
+    """run should use command name as config section."""
+    def greet(name: str) -> str:
+        return f"Hello, {name}!"
+
+    path = tmp_path / "tool.ini"
+    path.write_text("[greet]\nname = world\n")
+    assert run(Command(greet), [], config=Config(path)) == "Hello, world!"
@@ -1,5 +1,6 @@
 """Test convert.py"""
 
+from pathlib import Path
 import typing as t
 
 from infer_parser import Parser
@@ -7,7 +8,7 @@ import pytest
 
 from climux import Command
 from climux.args import opt
-from climux.convert import CantConvert, convert
+from climux.convert import CantConvert, ConvertOptions, convert
 from climux.utils import make_simple_parser
 
 
@@ -225,3 +226,106 @@ def test_convert_with_failing_custom_parsers_without_type_hints() -> None:
     assert "arg" in result.args[0]
 
     assert func(True)  # type: ignore
+
+
+def test_convert_argfile(tmp_path: Path) -> None:
+    """convert should read *args and **kwargs from argument files."""
+    def func(*args: int, **kwargs: float) -> None:  # pylint: disable=unused-argument; # noqa: E501
+        """Does nothing."""
+
+    args_file = tmp_path / "args"
+    args_file.write_text("\n".join(str(i) for i in range(5000)))
+    kwargs_file = tmp_path / "kwargs"
+    kwargs_file.write_bytes(b"a\x001.5\x00b\x002.5\x00")
+
+    command = Command(func)
+    parsers = get_parsers(command)
+    result = convert(func, dict(
+        args=["-1", f"@{args_file}"],
+        kwargs=[f"@{kwargs_file}", "c", "3"],
+    ), parsers, options=ConvertOptions(argfile_prefix="@"))
+    assert result == (
+        (-1, *range(5000)),
+        {"a": 1.5, "b": 2.5, "c": 3.0},
+    )
+
+    # Prefix is ignored if argument files aren't enabled.
+    result = convert(func, dict(args=[f"@{args_file}"], kwargs=[]), parsers)
+    assert isinstance(result, CantConvert)
+
+
+def test_convert_argfile_custom_parser(tmp_path: Path) -> None:
+    """Argument files should be split into elements of the custom parser."""
+    def func(*args: str) -> None:  # pylint: disable=unused-argument
+        """Does nothing."""
+
+    def parse(tokens: t.Sequence[str]) -> t.Tuple[str, ...]:
+        if len(tokens) % 3:
+            raise ValueError(tokens)
+        return tuple(":".join(tokens[i:i + 3])
+                     for i in range(0, len(tokens), 3))
+
+    parser = Parser(t.Tuple[t.Tuple[str, str, str], ...], parse, "*")
+    command = Command(func, custom=dict(args=opt(parser=parser)))
+    path = tmp_path / "args"
+    path.write_text("\n".join(f"{i}\nx\ny" for i in range(2000)))
+    result = convert(func, {"args": [f"@{path}"]}, get_parsers(command),
+                     options=ConvertOptions(argfile_prefix="@"))
+    assert result == (tuple(f"{i}:x:y" for i in range(2000)), {})
+
+
+def test_convert_invalid_argfile(tmp_path: Path) -> None:
+    """convert should fail if argument file is missing or invalid."""
+    def func(*args: int) -> None:  # pylint: disable=unused-argument
+        """Does nothing."""
+
+    parsers = get_parsers(Command(func))
+    options = ConvertOptions(argfile_prefix="@")
+    result = convert(func, {"args": [f"@{tmp_path / 'missing'}"]}, parsers,
+                     options=options)
+    assert isinstance(result, CantConvert)
+    assert "can't read argument file" in result.args[0]
+
+    path = tmp_path / "args"
+    path.write_text("1\nfoo\n3")
+    result = convert(func, {"args": [f"@{path}"]}, parsers,
+                     options=options)
+    assert isinstance(result, CantConvert)
+    assert "invalid value at item 1: 'foo'" in result.args[0]
+
+    path.write_text("\n".join(["1"] * 5000 + ["bar"] + ["2"] * 5000))
+    result = convert(func, {"args": [f"@{path}"]}, parsers,
+                     options=options)
+    assert isinstance(result, CantConvert)
+    assert "invalid value at item 5000: 'bar'" in result.args[0]
+    assert len(result.args[0]) < 100
+
+
+def test_convert_all_errors() -> None:
+    """convert should report every invalid parameter with all_errors."""
+    # pylint: disable=unused-argument
+    def func(count: int, ratio: float, name: str, limit: int) -> None:
+        """Does nothing."""
+
+    parsers = get_parsers(Command(func))
+    inputs = {"count": ["x"], "ratio": ["y"], "name": ["a"], "limit": None}
+    result = convert(func, inputs, parsers)
+    assert isinstance(result, CantConvert)
+    assert result.errors == [result]
+
+    result = convert(func, inputs, parsers,
+                     options=ConvertOptions(all_errors=True))
+    assert isinstance(result, CantConvert)
+    assert len(result.errors) == 3
+    lines = result.args[0].splitlines()
+    assert lines[0] == "3 invalid arguments:"
+    assert "argument count" in lines[1] and "expected int" in lines[1]
+    assert "argument ratio" in lines[2] and "expected float" in lines[2]
+    assert "missing parameter: limit" in lines[3]
+
+    inputs = {"count": ["1"], "ratio": ["y"], "name": ["a"], "limit": ["2"]}
+    result = convert(func, inputs, parsers,
+                     options=ConvertOptions(all_errors=True))
+    assert isinstance(result, CantConvert)
+    assert result.errors == [result]
+    assert "argument ratio" in result.args[0]
@@ -0,0 +1,126 @@
+"""Test limits.py."""
+
+import asyncio
+import threading
+import time
+import typing as t
+
+from pytest import CaptureFixture
+import pytest
+
+from climux import Command, LimitExceeded, run
+from climux.limits import EXIT_TIMEOUT, CantPickle, limit
+
+
+def sleep(seconds: float) -> float:
+    """Sleep and return seconds."""
+    time.sleep(seconds)
+    return seconds
+
+
+async def async_sleep(seconds: float) -> float:
+    """Sleep asynchronously and return seconds."""
+    await asyncio.sleep(seconds)
+    return seconds
+
+
+def allocate(size: int) -> int:
+    """Allocate bytes."""
+    return len(bytearray(size))
+
+
+def spin(seconds: float) -> None:
+    """Use CPU time."""
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+
+def fail() -> None:
+    """Raise exception."""
+    raise KeyError("fail")
+
+
+def make_lock() -> t.Any:
+    """Return unpicklable result."""
+    return threading.Lock()
+
+
+def test_limit_passes_result() -> None:
+    """Results and exceptions should be passed back from worker."""
+    assert limit(sleep, timeout=5)(0) == 0
+    assert limit(async_sleep, max_memory=2**34)(0) == 0
+
+    with pytest.raises(KeyError):
+        limit(fail, timeout=5)()
+
+
+def test_limit_start_method() -> None:
+    """Workers should use the requested start method."""
+    assert limit(sleep, timeout=5, start_method="spawn")(0) == 0
+    assert limit(lambda: 1, timeout=5, start_method="fork")() == 1
+
+
+def test_limit_unpicklable() -> None:
+    """Unpicklable functions and results should raise CantPickle."""
+    with pytest.raises(CantPickle, match="can't pickle result of type"):
+        limit(make_lock, timeout=5)()
+    with pytest.raises(CantPickle, match="can't pickle command function"):
+        limit(lambda: 1, timeout=5)()
+
+
+def test_command_unpicklable(capsys: CaptureFixture[str]) -> None:
+    """Commands with unpicklable results should fail with usage error."""
+    with pytest.raises(SystemExit) as exc_info:
+        run(Command(make_lock, timeout=5), [])
+    assert exc_info.value.code == 2
+    _, err = capsys.readouterr()
+    assert "can't pickle result of type lock" in err
+
+
+def test_limit_without_limits() -> None:
+    """Functions without limits should run unchanged, e.g. in event loops."""
+    assert limit(async_sleep) is async_sleep
+
+    async def main() -> t.Any:
+        return await Command(async_sleep).call(seconds=0)
+
+    assert asyncio.run(main()) == 0
+
+
+@pytest.mark.parametrize("function", [sleep, async_sleep])
+def test_limit_timeout(function: t.Callable[[float], t.Any]) -> None:
+    """Commands should be interrupted when they time out."""
+    start = time.perf_counter()
+    with pytest.raises(LimitExceeded) as exc_info:
+        limit(function, timeout=0.2)(5)
+    assert time.perf_counter() - start < 2
+    assert exc_info.value.limit == "timeout"
+    assert exc_info.value.status == EXIT_TIMEOUT
+
+
+def test_limit_memory() -> None:
+    """Worker should fail if it allocates too much memory."""
+    with pytest.raises(LimitExceeded) as exc_info:
+        limit(allocate, max_memory=2**33)(2**34)
+    assert exc_info.value.limit == "memory"
+    assert limit(allocate, max_memory=2**33)(2**20) == 2**20
+
+
+def test_limit_cpu() -> None:
+    """Worker should get killed if it uses too much CPU time."""
+    with pytest.raises(LimitExceeded) as exc_info:
+        limit(spin, max_cpu=1)(10)
+    assert exc_info.value.limit == "cpu"
+
+
+def test_command_timeout(capsys: CaptureFixture[str]) -> None:
+    """Commands that time out should exit with distinct status."""
+    command = Command(sleep, timeout=1)
+    assert run(command, ["--seconds", "0"]) == 0
+
+    with pytest.raises(SystemExit) as exc_info:
+        run(command, ["--seconds", "5"])
+    assert exc_info.value.code == EXIT_TIMEOUT
+    _, err = capsys.readouterr()
+    assert "timed out after 1 seconds" in err
@@ -0,0 +1,137 @@
+"""Test mapped.py."""
+
+import mmap
+from pathlib import Path
+import typing as t
+
+from pytest import CaptureFixture
+import pytest
+
+from climux import Command, run
+
+
+def test_memoryview_parameter(tmp_path: Path) -> None:
+    """memoryview parameters should get read-only views of files."""
+    views = []
+
+    def func(data: memoryview) -> bytes:
+        views.append(data)
+        assert data.readonly
+        return bytes(data[:3])
+
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"foobar")
+    assert run(Command(func), ["--data", str(path)]) == b"foo"
+
+    with pytest.raises(ValueError):
+        views[0].tobytes()
+
+
+def test_mmap_parameter(tmp_path: Path) -> None:
+    """mmap parameters should get memory-mapped files."""
+    maps: t.List[mmap.mmap] = []
+
+    def func(*data: mmap.mmap) -> t.List[bytes]:
+        maps.extend(data)
+        return [m[:] for m in data]
+
+    first = tmp_path / "first"
+    first.write_bytes(b"foo")
+    second = tmp_path / "second"
+    second.write_bytes(b"bar")
+    assert run(Command(func), ["--data", str(first), str(second)]) == [
+        b"foo", b"bar"
+    ]
+    assert all(m.closed for m in maps)
+
+
+def test_mapped_generator(tmp_path: Path,
+                          capsys: CaptureFixture[str]) -> None:
+    """Mapped files should be released after generator results finish."""
+    views = []
+
+    def chunks(data: memoryview) -> t.Iterator[bytes]:
+        views.append(data)
+        for i in range(0, len(data), 2):
+            yield bytes(data[i:i + 2])
+
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"foobar")
+    result = Command(chunks).call_tokens({"data": [str(path)]})
+    assert next(result) == b"fo"
+    assert views[0].tobytes() == b"foobar"
+    assert list(result) == [b"ob", b"ar"]
+    with pytest.raises(ValueError):
+        views[0].tobytes()
+
+    result = Command(chunks).call_tokens({"data": [str(path)]})
+    assert next(result) == b"fo"
+    result.close()
+    with pytest.raises(ValueError):
+        views[1].tobytes()
+
+    run(Command(chunks), ["--data", str(path)])
+    assert capsys.readouterr().out == "b'fo'\nb'ob'\nb'ar'\n"
+
+
+def test_empty_mapped_file(tmp_path: Path,
+                           capsys: CaptureFixture[str]) -> None:
+    """Empty files can be viewed, but not mapped."""
+    def view(data: memoryview) -> int:
+        return len(data)
+
+    def mapped(data: mmap.mmap) -> int:
+        return len(data)
+
+    path = tmp_path / "empty"
+    path.touch()
+    assert run(Command(view), ["--data", str(path)]) == 0
+
+    with pytest.raises(SystemExit):
+        run(Command(mapped), ["--data", str(path)])
+    _, err = capsys.readouterr()
+    assert "expected mmap" in err
+
+
+def test_missing_mapped_file(tmp_path: Path,
+                             capsys: CaptureFixture[str]) -> None:
+    """Missing files should be rejected before the command runs."""
+    def func(data: memoryview) -> None:
+        raise AssertionError(data)
+
+    with pytest.raises(SystemExit):
+        run(Command(func), ["--data", str(tmp_path / "missing")])
+    _, err = capsys.readouterr()
+    assert "invalid value" in err
+    assert "expected memoryview" in err
+
+
+def test_ndarray_parameter(tmp_path: Path) -> None:
+    """.npy files should be loaded with mmap_mode="r"."""
+    numpy = pytest.importorskip("numpy")
+
+    def func(array: numpy.ndarray) -> float:  # type: ignore
+        assert not array.flags.writeable
+        return float(array.sum())
+
+    path = tmp_path / "array.npy"
+    numpy.save(path, numpy.arange(10))
+    assert run(Command(func), ["--array", str(path)]) == 45.0
+
+    path = tmp_path / "array.bin"
+    path.write_bytes(bytes([1, 2, 3]))
+    assert run(Command(func), ["--array", str(path)]) == 6.0
+
+
+def test_ndarray_lifetime(tmp_path: Path) -> None:
+    """Arrays should keep their maps alive after the command returns."""
+    numpy = pytest.importorskip("numpy")
+
+    def func(array: numpy.ndarray) -> t.Any:  # type: ignore
+        return array[1:]
+
+    path = tmp_path / "matrix.npy"
+    matrix = numpy.arange(6, dtype=numpy.float32).reshape((2, 3))
+    numpy.save(path, numpy.asfortranarray(matrix))
+    result = run(Command(func), ["--array", str(path)])
+    assert result.tolist() == [[3.0, 4.0, 5.0]]
@@ -0,0 +1,163 @@
+"""Test output.py."""
+
+import bz2
+import gzip
+import io
+import lzma
+from pathlib import Path
+import subprocess
+import sys
+import typing as t
+
+from pytest import CaptureFixture
+import pytest
+
+from climux import Cli, Command, UsageError, run
+from climux.output import (
+    EXIT_PIPE,
+    OutputClosed,
+    ThreadedWriter,
+    open_output,
+    write_result,
+)
+
+
+class ClosedPipe(io.StringIO):
+    """Output that raises BrokenPipeError after a few writes."""
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+
+    def write(self, text: str) -> int:
+        if self.limit <= 0:
+            raise BrokenPipeError
+        self.limit -= 1
+        return super().write(text)
+
+
+def test_write_result() -> None:
+    """Generators should be printed item by item."""
+    file = io.StringIO()
+    write_result([1, 2], file)
+    write_result((i for i in [1, 2]), file)
+    assert file.getvalue() == "[1, 2]\n1\n2\n"
+
+
+def test_write_result_iterator(tmp_path: Path) -> None:
+    """Iterators that aren't generators should be printed as-is."""
+    path = tmp_path / "input.txt"
+    path.write_text("foo\nbar\n")
+    with open(path, encoding="utf-8") as result:
+        file = io.StringIO()
+        write_result(result, file)
+        assert file.getvalue() == f"{result}\n"
+
+    numbers = iter([1, 2])
+    file = io.StringIO()
+    write_result(numbers, file)
+    assert file.getvalue() == f"{numbers}\n"
+    assert list(numbers) == [1, 2]
+
+
+def test_write_result_closed_pipe() -> None:
+    """Generators should be closed when the output pipe closes."""
+    produced = []
+    closed = False
+
+    def generate() -> t.Iterator[int]:
+        nonlocal closed
+        try:
+            for i in range(1000):
+                produced.append(i)
+                yield i
+        finally:
+            closed = True
+
+    with pytest.raises(OutputClosed):
+        write_result(generate(), ClosedPipe(4))
+    assert closed
+    assert len(produced) < 10
+
+
+SCRIPT = """\
+import sys
+from climux import Command, run
+
+def numbers():
+    try:
+        for i in range(10**7):
+            yield i
+    finally:
+        open(sys.argv[1], "w").write("closed")
+
+run(Command(numbers), [])
+"""
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs pipes")
+def test_run_closed_pipe(tmp_path: Path) -> None:
+    """run should stop early and exit cleanly when the pipe closes."""
+    marker = tmp_path / "marker"
+    with subprocess.Popen(
+        [sys.executable, "-c", SCRIPT, str(marker)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ) as proc:
+        assert proc.stdout is not None and proc.stderr is not None
+        assert proc.stdout.readline() == b"0\n"
+        proc.stdout.close()
+        stderr = proc.stderr.read()
+        assert proc.wait(timeout=30) == EXIT_PIPE
+    assert stderr == b""
+    assert marker.read_text() == "closed"
+
+
+@pytest.mark.parametrize("suffix,read", [
+    ("", lambda path: path.read_bytes()),
+    (".gz", lambda path: gzip.decompress(path.read_bytes())),
+    (".bz2", lambda path: bz2.decompress(path.read_bytes())),
+    (".xz", lambda path: lzma.decompress(path.read_bytes())),
+])
+def test_open_output(tmp_path: Path,
+                     suffix: str,
+                     read: t.Callable[[Path], bytes]) -> None:
+    """Output should be compressed based on the file suffix."""
+    path = tmp_path / f"result.ndjson{suffix}"
+    lines = [f'{{"id": {i}, "text": "\u00e9"}}' for i in range(50_000)]
+    with open_output(path) as file:
+        write_result((line for line in lines), file)
+    assert read(path).decode() == "".join(f"{line}\n" for line in lines)
+
+
+def test_threaded_writer_error() -> None:
+    """Errors in the writer thread should be raised in the caller."""
+    class Broken(io.BytesIO):
+        """File that can't be written to."""
+        def write(self, data: t.Any) -> int:
+            raise OSError("disk full")
+
+    writer = ThreadedWriter(t.cast(t.BinaryIO, Broken()), queue_size=1)
+    with pytest.raises(OSError):
+        for _ in range(100):
+            writer.write(b"x")
+        writer.close()
+
+
+def test_command_output_option(tmp_path: Path,
+                               capsys: CaptureFixture[str]) -> None:
+    """--climux-output should write result to file instead of stdout."""
+    def numbers(count: int) -> t.Iterator[int]:
+        yield from range(count)
+
+    path = tmp_path / "numbers.txt.gz"
+    run(Command(numbers), ["--count", "3", "--climux-output", str(path)])
+    assert gzip.decompress(path.read_bytes()) == b"0\n1\n2\n"
+    assert capsys.readouterr().out == ""
+
+    cli = Cli("test")
+    cli.add(Command(numbers))
+    ignored = tmp_path / "ignored.txt"
+    with pytest.raises(UsageError, match="--climux-output"):
+        cli.dispatch(["numbers", "--count", "3",
+                      "--climux-output", str(ignored)])
+    assert not ignored.exists()
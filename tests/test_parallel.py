@@ -0,0 +1,87 @@
+"""Test parallel.py."""
+
+from pathlib import Path
+import random
+import threading
+import time
+import typing as t
+
+from pytest import CaptureFixture
+import pytest
+
+from climux import Command, arg, run
+from climux.parallel import map_ordered
+
+
+def slow_sum(chunk: t.Tuple[int, ...]) -> int:
+    """Sum chunk after a random delay."""
+    time.sleep(random.random() / 100)
+    return sum(chunk)
+
+
+def square(*numbers: int) -> int:
+    """Square single number (module-level so it can be pickled)."""
+    (number,) = numbers
+    return number * number
+
+
+def test_map_ordered() -> None:
+    """Results should be in input order."""
+    assert list(map_ordered(slow_sum, range(50), workers=8)) == \
+        list(range(50))
+    assert list(map_ordered(slow_sum, range(10), chunksize=3)) == \
+        [3, 12, 21, 9]
+    assert not list(map_ordered(slow_sum, []))
+
+    with pytest.raises(ValueError):
+        map_ordered(slow_sum, [], window=0)
+    with pytest.raises(ValueError):
+        map_ordered(slow_sum, [], executor="fiber")
+
+
+def test_map_ordered_window() -> None:
+    """Items should be consumed lazily, at most window at a time."""
+    consumed = 0
+    lock = threading.Lock()
+
+    def items() -> t.Iterator[int]:
+        nonlocal consumed
+        for i in range(1000):
+            with lock:
+                consumed += 1
+            yield i
+
+    results = map_ordered(slow_sum, items(), workers=2, window=4)
+    assert next(results) == 0
+    assert consumed <= 5
+    results.close()
+
+
+def test_command_map_over(capsys: CaptureFixture[str]) -> None:
+    """Command should call function once per element of *args."""
+    threads = set()
+
+    def read(prefix: str, *paths: Path, upper: bool = False) -> str:
+        threads.add(threading.get_ident())
+        time.sleep(0.01)
+        text = f"{prefix}{''.join(p.name for p in paths)}"
+        return text.upper() if upper else text
+
+    command = Command(read, custom=dict(prefix=arg(), paths=arg()),
+                      map_over="paths", workers=4)
+    run(command, ["x", "a", "b", "c", "d", "--upper", "true"])
+    assert capsys.readouterr().out == "XA\nXB\nXC\nXD\n"
+    assert len(threads) > 1
+
+    chunked = Command(read, map_over="paths", chunksize=2)
+    assert list(chunked.call(prefix="-", paths=[Path(c) for c in "abc"])) \
+        == ["-ab", "-c"]
+
+    processes = Command(square, map_over="numbers", executor="process",
+                        workers=2, show_result=False)
+    assert list(processes.call(numbers=range(5))) == [0, 1, 4, 9, 16]
+
+    with pytest.raises(ValueError):
+        Command(read, map_over="prefix")
+    with pytest.raises(ValueError):
+        Command(read, map_over="paths", executor="fiber")
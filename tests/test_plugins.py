@@ -0,0 +1,85 @@
+"""Test plugins.py."""
+
+from pathlib import Path
+import sys
+import typing as t
+
+import pytest
+
+from climux import Cli, Command
+from climux import plugins
+
+
+@pytest.fixture(name="plugin_path")
+def fixture_plugin_path(tmp_path: Path,
+                        monkeypatch: pytest.MonkeyPatch) -> t.Iterator[Path]:
+    """Install fake distribution with climux commands on sys.path."""
+    site = tmp_path / "site"
+    site.mkdir()
+    (site / "fake_climux_plugin.py").write_text(
+        "from climux import Command\n"
+        "def greet(name: str = 'world') -> str:\n"
+        "    return f'Hello, {name}!'\n"
+        "bye = Command(lambda: 'Bye.', alias='bye')\n"
+    )
+    dist = site / "fake_climux_plugin-0.1.dist-info"
+    dist.mkdir()
+    (dist / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: fake-climux-plugin\nVersion: 0.1\n"
+    )
+    (dist / "entry_points.txt").write_text(
+        "[climux.test]\n"
+        "greet = fake_climux_plugin:greet\n"
+        "farewell = fake_climux_plugin:bye\n"
+    )
+    monkeypatch.syspath_prepend(str(site))
+    yield site
+    sys.modules.pop("fake_climux_plugin", None)
+
+
+def test_load_index(plugin_path: Path,
+                    monkeypatch: pytest.MonkeyPatch) -> None:
+    """load_index should only rescan if sys.path changed."""
+    expected = {
+        "greet": "fake_climux_plugin:greet",
+        "farewell": "fake_climux_plugin:bye",
+    }
+    assert plugins.load_index("climux.test") == expected
+    assert plugins.get_index_path("climux.test").exists()
+
+    def fail(group: str) -> t.Dict[str, str]:
+        raise AssertionError(group)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(plugins, "scan", fail)
+        assert plugins.load_index("climux.test") == expected
+
+    (plugin_path / "new_module.py").touch()
+    with monkeypatch.context() as patch:
+        patch.setattr(plugins, "scan", lambda group: {})
+        assert not plugins.load_index("climux.test")
+
+
+def test_cli_discover(plugin_path: Path) -> None:
+    """Discovered commands should be imported only when dispatched."""
+    assert plugin_path.exists()
+    cli = Cli("test")
+    cli.add(Command(lambda: "Mine.", alias="greet"))
+    cli.discover("climux.test")
+
+    assert set(cli.lazy) == {"farewell"}
+    assert "fake_climux_plugin" not in sys.modules
+    cli.build()
+    assert "fake_climux_plugin" not in sys.modules
+
+    assert cli.run(["farewell"]) == "Bye."
+    assert "fake_climux_plugin" in sys.modules
+    assert not cli.lazy
+    assert cli.run(["greet"]) == "Mine."
+
+
+def test_lazy_command_from_function(plugin_path: Path) -> None:
+    """Functions should be wrapped in Command named after the entry point."""
+    assert plugin_path.exists()
+    command = plugins.LazyCommand("hi", "fake_climux_plugin:greet").load()
+    assert command.name == "hi"
@@ -0,0 +1,105 @@
+"""Test pool.py."""
+
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import threading
+import time
+import typing as t
+
+import pytest
+
+from climux.pool import Pool
+
+
+class Connection:  # pylint: disable=too-few-public-methods
+    """Fake connection."""
+    counter = itertools.count()
+
+    def __init__(self) -> None:
+        self.number = next(self.counter)
+        self.closed = False
+
+    def close(self) -> None:
+        """Close connection."""
+        self.closed = True
+
+
+def test_pool_reuse() -> None:
+    """Pool should create instances lazily and reuse them."""
+    created: t.List[Connection] = []
+
+    def factory() -> Connection:
+        created.append(Connection())
+        return created[-1]
+
+    pool = Pool(factory)
+    assert not created
+    with pool.acquire() as first:
+        pass
+    with pool.acquire() as second:
+        pass
+    assert first is second
+    assert len(created) == 1
+
+
+def test_pool_size() -> None:
+    """Pool shouldn't create more than size instances."""
+    pool = Pool(Connection, size=2)
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def work(_: int) -> int:
+        nonlocal active, peak
+        with pool.acquire() as conn:
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.01)
+            with lock:
+                active -= 1
+            return t.cast(int, conn.number)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        ids = set(executor.map(work, range(16)))
+    assert len(ids) <= 2
+    assert peak <= 2
+
+    with pytest.raises(ValueError):
+        Pool(Connection, size=0)
+
+
+def test_pool_close() -> None:
+    """Closing the pool should close idle and returned instances."""
+    pool = Pool(Connection, size=2)
+    busy = pool.get()
+    idle = pool.get()
+    pool.put(idle)
+    pool.close()
+    assert pool.closed
+    assert idle.closed
+    assert not busy.closed
+    pool.put(busy)
+    assert busy.closed
+    with pytest.raises(RuntimeError):
+        pool.get()
+
+
+def test_pool_factory_error() -> None:
+    """Failed instance creation shouldn't take up a slot."""
+    calls = []
+
+    def factory() -> t.List[int]:
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("connection refused")
+        return []
+
+    closed: t.List[t.List[int]] = []
+    pool = Pool(factory, close=closed.append)
+    with pytest.raises(OSError):
+        pool.get()
+    with pool.acquire() as instance:
+        assert instance == []
+    pool.close()
+    assert closed == [[]]
@@ -0,0 +1,134 @@
+"""Test tasks.py."""
+
+from pathlib import Path
+import threading
+import time
+import typing as t
+
+from pytest import CaptureFixture
+import pytest
+
+from climux import Cli
+from climux.tasks import Runner, Task, TaskFailed, shell
+
+
+@pytest.fixture(name="runner")
+def fixture_runner(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Runner:
+    """Create runner in temporary directory."""
+    monkeypatch.chdir(tmp_path)
+    return Runner(workers=4, state=tmp_path / "state.json")
+
+
+def test_runner_plan(runner: Runner) -> None:
+    """Dependencies should come before dependents."""
+    runner.add(Task(lambda: None, alias="a", deps=["b", "c"]))
+    runner.add(Task(lambda: None, alias="b", deps=["c"]))
+    runner.add(Task(lambda: None, alias="c"))
+    assert runner.plan(["a"]) == ["c", "b", "a"]
+
+    runner.add(Task(lambda: None, alias="c", deps=["a"]))
+    with pytest.raises(ValueError):
+        runner.plan(["a"])
+    with pytest.raises(KeyError):
+        runner.plan(["d"])
+
+
+def test_runner_concurrency(runner: Runner) -> None:
+    """Independent tasks should run concurrently, after dependencies."""
+    log: t.List[str] = []
+    barrier = threading.Barrier(3, timeout=5)
+
+    def make(name: str) -> t.Callable[[], None]:
+        def function() -> None:
+            if name != "all":
+                barrier.wait()
+            log.append(name)
+        return function
+
+    for name in ("mypy", "pylint", "flake8"):
+        runner.add(Task(make(name), alias=name))
+    runner.add(Task(make("all"), alias="all",
+                    deps=["mypy", "pylint", "flake8"]))
+    runner.run(["all"])
+    assert sorted(log[:3]) == ["flake8", "mypy", "pylint"]
+    assert log[3] == "all"
+
+
+def test_runner_up_to_date(runner: Runner,
+                           capsys: CaptureFixture[str]) -> None:
+    """Tasks should be skipped if their inputs haven't changed."""
+    calls = []
+    Path("input.in").write_text("foo", encoding="utf-8")
+
+    def build() -> None:
+        calls.append(1)
+        text = Path("input.in").read_text(encoding="utf-8")
+        Path("output.txt").write_text(text, encoding="utf-8")
+
+    runner.add(Task(build, inputs=["*.in"], outputs=["output.txt"]))
+    runner.run(["build"])
+    runner.run(["build"])
+    assert len(calls) == 1
+    out, _ = capsys.readouterr()
+    assert "[build] up to date" in out
+
+    Path("input.in").write_text("bar", encoding="utf-8")
+    runner.run(["build"])
+    assert len(calls) == 2
+
+    Path("output.txt").unlink()
+    runner.run(["build"])
+    assert len(calls) == 3
+
+
+def test_runner_failure(runner: Runner) -> None:
+    """Dependents of failed tasks shouldn't run."""
+    log = []
+
+    def fail() -> None:
+        time.sleep(0.05)
+        raise TaskFailed("fail")
+
+    runner.add(Task(fail))
+    runner.add(Task(lambda: log.append("slow"), alias="slow"))
+    runner.add(Task(lambda: log.append("after"), alias="after",
+                    deps=["fail", "slow"]))
+    with pytest.raises(TaskFailed):
+        runner.run(["after"])
+    assert log == ["slow"]
+
+
+def test_shell(runner: Runner, capsys: CaptureFixture[str]) -> None:
+    """Shell command output should be prefixed with the task name."""
+    runner.add(Task(lambda: shell("echo foo; echo bar"), alias="echo"))
+    runner.add(Task(lambda: shell("exit 3"), alias="fail"))
+    runner.run(["echo"])
+    out, _ = capsys.readouterr()
+    assert "[echo] $ echo foo; echo bar\n[echo] foo\n[echo] bar\n" in out
+
+    with pytest.raises(TaskFailed) as exc_info:
+        runner.run(["fail"])
+    assert "exit status 3" in exc_info.value.args[0]
+    assert exc_info.value.returncode == 3
+
+    with pytest.raises(SystemExit) as exit_info:
+        runner.main("tasks", args_=["fail"])
+    assert exit_info.value.code == 3
+    _, err = capsys.readouterr()
+    assert err == "tasks: error: exit 3 (exit status 3)\n"
+
+
+def test_runner_commands(runner: Runner) -> None:
+    """Task commands should pass arguments to the target only."""
+    log = []
+
+    def docker(version: str = "3.9") -> None:
+        log.append(version)
+
+    runner.add(Task(lambda: log.append("dep"), alias="dep"))
+    runner.add(Task(docker, deps=["dep"]))
+    cli = Cli("tasks")
+    for command in runner.commands():
+        cli.add(command)
+    cli.run(["docker", "--version", "3.8"])
+    assert log == ["dep", "3.8"]
@@ -0,0 +1,22 @@
+"""Test trie.py."""
+
+from climux.trie import Trie
+
+
+def test_trie_resolve() -> None:
+    """Trie should resolve exact matches and unique prefixes."""
+    trie = Trie(["migrate", "merge", "backup", "back"])
+    assert trie.resolve("migrate") == "migrate"
+    assert trie.resolve("mi") == "migrate"
+    assert trie.resolve("mer") == "merge"
+    assert trie.resolve("m") is None
+    assert trie.resolve("back") == "back"
+    assert trie.resolve("backu") == "backup"
+    assert trie.resolve("x") is None
+    assert trie.resolve("migrates") is None
+
+
+def test_trie_insert_duplicate() -> None:
+    """Inserting the same word twice shouldn't make prefixes ambiguous."""
+    trie = Trie(["foo", "foo"])
+    assert trie.resolve("f") == "foo"
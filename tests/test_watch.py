@@ -0,0 +1,158 @@
+"""Test watch.py."""
+
+from pathlib import Path
+import sys
+import threading
+import time
+import typing as t
+
+from pytest import CaptureFixture
+import pytest
+
+from climux import Command
+from climux.cli import build_parser
+from climux.convert import CantConvert
+from climux.watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    find_paths,
+    rerun_on_change,
+)
+
+
+def test_find_paths(tmp_path: Path) -> None:
+    """find_paths should find paths in nested containers."""
+    value = ((tmp_path / "a", 1), {"b": [tmp_path / "b"]}, "c")
+    assert find_paths(value) == {tmp_path / "a", tmp_path / "b"}
+
+
+def make_watchers(paths: t.List[Path]) -> t.Iterator[t.Any]:
+    """Create every available watcher."""
+    yield PollingWatcher(paths, interval=0.01)
+    if sys.platform.startswith("linux"):
+        yield InotifyWatcher(paths)
+
+
+def test_watchers(tmp_path: Path) -> None:
+    """Watchers should detect relevant changes only."""
+    watched = tmp_path / "watched.txt"
+    other = tmp_path / "other.txt"
+    watched.write_text("a")
+    directory = tmp_path / "dir"
+    directory.mkdir()
+
+    for watcher in make_watchers([watched, directory]):
+        try:
+            assert not watcher.wait(0.05)
+            other.write_text(str(time.time()))
+            assert not watcher.wait(0.05)
+
+            watched.write_text(str(time.time()))
+            assert watcher.wait(1)
+            while watcher.wait(0.05):
+                pass
+
+            (directory / "new.txt").write_text("new")
+            assert watcher.wait(1)
+        finally:
+            watcher.close()
+
+
+def test_watchers_nested(tmp_path: Path) -> None:
+    """Watchers should detect changes in subdirectories of directories."""
+    nested = tmp_path / "a" / "b"
+    nested.mkdir(parents=True)
+    (nested / "file.txt").write_text("a")
+
+    for index, watcher in enumerate(make_watchers([tmp_path / "a"])):
+        try:
+            assert not watcher.wait(0.05)
+            (nested / "file.txt").write_text(str(time.time()))
+            assert watcher.wait(1)
+            while watcher.wait(0.05):
+                pass
+
+            later = nested / f"later{index}"
+            later.mkdir()
+            (later / "new.txt").write_text("new")
+            assert watcher.wait(1)
+            while watcher.wait(0.05):
+                pass
+
+            (later / "new.txt").write_text(str(time.time()))
+            assert watcher.wait(1)
+        finally:
+            watcher.close()
+
+
+def run_in_thread(function: t.Callable[[threading.Event], None]
+                  ) -> t.Callable[[], None]:
+    """Run function in thread and return function that stops it."""
+    stop = threading.Event()
+    thread = threading.Thread(target=function, args=(stop,))
+    thread.start()
+
+    def join() -> None:
+        stop.set()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+    return join
+
+
+def test_rerun_on_change(tmp_path: Path) -> None:
+    """Bursts of changes should only rerun function once."""
+    path = tmp_path / "input.txt"
+    path.write_text("0")
+    runs: t.List[str] = []
+
+    def function() -> None:
+        runs.append(path.read_text())
+        if len(runs) == 1:
+            raise ValueError("errors shouldn't stop watching")
+
+    join = run_in_thread(
+        lambda stop: rerun_on_change(function, [path], 0.2, stop)
+    )
+    try:
+        time.sleep(0.2)
+        for i in range(1, 6):
+            path.write_text(str(i))
+            time.sleep(0.01)
+        time.sleep(0.8)
+    finally:
+        join()
+    assert runs == ["0", "5"]
+
+
+def test_command_watch(tmp_path: Path,
+                       capsys: CaptureFixture[str]) -> None:
+    """--watch should rerun the command when input files change."""
+    path = tmp_path / "input.txt"
+    path.write_text("hello")
+
+    def cat(path: Path, upper: bool = False) -> str:
+        text = path.read_text()
+        return text.upper() if upper else text
+
+    command = Command(cat, watch=True)
+    parser = build_parser(command)
+    inputs = vars(parser.parse_args(["--path", str(path), "--watch"]))
+
+    join = run_in_thread(
+        lambda stop: command.watch_files(inputs, debounce=0.05, stop=stop)
+    )
+    try:
+        time.sleep(0.2)
+        path.write_text("bye")
+        time.sleep(0.8)
+    finally:
+        join()
+    assert capsys.readouterr().out == "hello\nbye\n"
+
+    assert "--watch" not in build_parser(Command(cat)).format_help()
+
+    def echo(text: str) -> str:
+        return text
+
+    with pytest.raises(CantConvert):
+        Command(echo, watch=True).watch_files({"text": ["x"]})
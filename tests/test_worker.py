@@ -0,0 +1,239 @@
+"""Test worker.py."""
+
+from pathlib import Path
+import threading
+import time
+import typing as t
+
+from pytest import CaptureFixture
+import pytest
+
+from climux import Cli, Command
+from climux.worker import (
+    EXIT_ABANDONED,
+    Job,
+    MemoryQueue,
+    Queue,
+    QueueServer,
+    Result,
+    SQLiteQueue,
+    TCPQueue,
+    Worker,
+    open_queue,
+)
+
+
+def make_cli() -> Cli:
+    """Create Cli with commands that succeed, fail and take time."""
+    def add(left: int, right: int) -> int:
+        return left + right
+
+    def fail() -> None:
+        raise RuntimeError("failed")
+
+    def nap(seconds: float) -> str:
+        time.sleep(seconds)
+        return "done"
+
+    cli = Cli("calc")
+    for function in (add, fail, nap):
+        cli.add(Command(function))
+    return cli
+
+
+def check_worker(queue: Queue) -> None:
+    """Run jobs in queue and check results."""
+    success = queue.submit(["add", "--left", "1", "--right", "2"])
+    usage = queue.submit(["add", "--left", "x", "--right", "2"])
+    error = queue.submit(["fail"])
+    naps = [queue.submit(["nap", "--seconds", "0.2"]) for _ in range(4)]
+    assert queue.result(success) is None
+
+    start = time.perf_counter()
+    Worker(make_cli(), queue, slots=4).run(drain=True)
+    assert time.perf_counter() - start < 0.6
+
+    assert queue.result(success) == Result(0, "3\n")
+    usage_result = queue.result(usage)
+    assert usage_result is not None and usage_result.status == 2
+    assert "invalid value" in usage_result.output
+    error_result = queue.result(error)
+    assert error_result is not None and error_result.status == 1
+    assert "RuntimeError: failed" in error_result.output
+    assert all(queue.result(nap) == Result(0, "done\n") for nap in naps)
+    assert queue.claim() is None
+
+
+def check_touch(queue: Queue) -> None:
+    """Touched jobs should stay invisible until they're done."""
+    job_id = queue.submit(["a"])
+    job = queue.claim()
+    assert job is not None and job.id == job_id
+    for _ in range(3):
+        time.sleep(0.03)
+        assert queue.touch(job_id)
+        assert queue.claim() is None
+    queue.complete(job_id, Result(0, ""))
+    assert not queue.touch(job_id)
+
+
+def check_max_attempts(queue: Queue) -> None:
+    """Jobs should be abandoned after max_attempts claims (of 2)."""
+    job_id = queue.submit(["a"])
+    for attempts in (1, 2):
+        job = queue.claim()
+        assert job is not None and job.attempts == attempts
+        time.sleep(0.06)
+    assert queue.claim() is None
+    assert queue.result(job_id) == Result(EXIT_ABANDONED,
+                                          "job abandoned after 2 attempts\n")
+    assert not queue.touch(job_id)
+
+
+def test_memory_queue_visibility() -> None:
+    """Unfinished jobs should be redelivered after the timeout."""
+    queue = MemoryQueue(visibility=0.05)
+    job_id = queue.submit(["a"])
+    job = queue.claim()
+    assert job is not None and job.id == job_id and job.attempts == 1
+    assert queue.claim() is None
+    time.sleep(0.06)
+    again = queue.claim()
+    assert again is not None and again.id == job_id and again.attempts == 2
+
+    queue.complete(job_id, Result(0, "first"))
+    queue.complete(job_id, Result(1, "second"))
+    assert queue.result(job_id) == Result(0, "first")
+    time.sleep(0.06)
+    assert queue.claim() is None
+
+    check_touch(queue)
+    check_max_attempts(MemoryQueue(visibility=0.05, max_attempts=2))
+
+
+def test_sqlite_queue(tmp_path: Path) -> None:
+    """Workers should run jobs from SQLite queue."""
+    path = str(tmp_path / "jobs.db")
+    check_worker(SQLiteQueue(path))
+
+    queue = SQLiteQueue(path, visibility=0.05)
+    job_id = queue.submit(["a"])
+    job = queue.claim()
+    assert job is not None and job.id == job_id
+    assert SQLiteQueue(path).claim() is None
+    time.sleep(0.06)
+    again = queue.claim()
+    assert again is not None and again.attempts == 2
+    queue.complete(job_id, Result(0, ""))
+
+    check_touch(queue)
+    check_max_attempts(SQLiteQueue(path, visibility=0.05, max_attempts=2))
+
+
+class FlakyQueue(MemoryQueue):
+    """MemoryQueue that fails the first claim and the first completion."""
+    def __init__(self) -> None:
+        super().__init__(visibility=0.05)
+        self.failures = {"claim", "complete"}
+
+    def fail(self, operation: str) -> None:
+        """Raise ConnectionError the first time operation is called."""
+        if operation in self.failures:
+            self.failures.remove(operation)
+            raise ConnectionError(operation)
+
+    def claim(self) -> t.Optional[Job]:
+        self.fail("claim")
+        return super().claim()
+
+    def complete(self, job_id: str, outcome: Result) -> None:
+        self.fail("complete")
+        super().complete(job_id, outcome)
+
+
+def test_worker_queue_errors(capsys: CaptureFixture[str]) -> None:
+    """Worker should report queue errors and retry."""
+    queue = FlakyQueue()
+    job_id = queue.submit(["add", "--left", "1", "--right", "2"])
+    stop = threading.Event()
+    thread = threading.Thread(target=Worker(make_cli(), queue, poll=0.01).run,
+                              args=(stop,))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while queue.result(job_id) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stop.set()
+    thread.join()
+    assert queue.result(job_id) == Result(0, "3\n")
+    assert not queue.failures
+    assert "ConnectionError: complete" in capsys.readouterr().err
+
+
+class CountingQueue(MemoryQueue):
+    """MemoryQueue that counts claims."""
+    def __init__(self) -> None:
+        super().__init__(visibility=0.1)
+        self.claims = 0
+
+    def claim(self) -> t.Optional[Job]:
+        job = super().claim()
+        self.claims += job is not None
+        return job
+
+
+def test_worker_heartbeat() -> None:
+    """Jobs that run longer than the visibility timeout shouldn't rerun."""
+    queue = CountingQueue()
+    job_id = queue.submit(["nap", "--seconds", "0.3"])
+    stop = threading.Event()
+    worker = Worker(make_cli(), queue, slots=2, poll=0.01, heartbeat=0.02)
+    thread = threading.Thread(target=worker.run, args=(stop,))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while queue.result(job_id) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stop.set()
+    thread.join()
+    assert queue.result(job_id) == Result(0, "done\n")
+    assert queue.claims == 1
+
+
+@pytest.fixture(name="server")
+def fixture_server() -> t.Iterator[QueueServer]:
+    """Run queue server on localhost."""
+    with QueueServer(("127.0.0.1", 0)) as queue_server:
+        thread = threading.Thread(target=queue_server.serve_forever)
+        thread.start()
+        yield queue_server
+        queue_server.shutdown()
+        thread.join()
+
+
+def test_tcp_queue(server: QueueServer) -> None:
+    """Workers should run jobs from TCP queue server."""
+    host, port = server.server_address[:2]
+    check_worker(TCPQueue(str(host), int(port)))
+
+    queue = TCPQueue(str(host), int(port))
+    job_id = queue.submit(["a"])
+    assert queue.claim() is not None and queue.touch(job_id)
+    queue.complete(job_id, Result(0, ""))
+    assert not queue.touch(job_id)
+
+    with pytest.raises(RuntimeError):
+        TCPQueue(str(host), int(port)).request(op="invalid")
+
+
+def test_open_queue(tmp_path: Path) -> None:
+    """open_queue should parse queue URLs."""
+    queue = open_queue(f"sqlite://{tmp_path}/jobs.db")
+    assert isinstance(queue, SQLiteQueue)
+    assert queue.path == f"{tmp_path}/jobs.db"
+
+    queue = open_queue("tcp://localhost:8765")
+    assert isinstance(queue, TCPQueue)
+    assert queue.address == ("localhost", 8765)
+
+    for url in ("redis://localhost", "tcp://localhost", "sqlite://"):
+        with pytest.raises(ValueError):
+            open_queue(url)